@@ -32,7 +32,7 @@ Example Usage:
 """
 
 # Core configuration
-from .db_config import DB_PATH, get_db_connection
+from .db_config import DB_PATH, get_db_connection, close_db_connection
 
 # Trade and safety event logging
 from .db_helpers import (
@@ -49,10 +49,13 @@ from .market_data_manager import (
     OHLCVBar,
     insert_bars,
     get_bars,
+    get_bars_soa,
     aggregate_bars,
     get_latest_bar,
     get_freshness_info,
     detect_gaps,
+    rebuild_gaps,
+    flush_freshness_updates,
     cleanup_old_data,
 )
 
@@ -73,6 +76,7 @@ __all__ = [
     # Configuration
     "DB_PATH",
     "get_db_connection",
+    "close_db_connection",
     # Trade logging
     "initialize_database",
     "log_trade",
@@ -84,10 +88,13 @@ __all__ = [
     "OHLCVBar",
     "insert_bars",
     "get_bars",
+    "get_bars_soa",
     "aggregate_bars",
     "get_latest_bar",
     "get_freshness_info",
     "detect_gaps",
+    "rebuild_gaps",
+    "flush_freshness_updates",
     "cleanup_old_data",
     # Snapshots
     "save_snapshot",
@@ -8,10 +8,22 @@ all data persistence operations.
 Configuration Choices:
 - journal_mode=WAL: Write-Ahead Logging for better concurrency
 - synchronous=NORMAL: Balanced durability/performance trade-off
+- cache_size=-64000: ~64MB page cache per connection
+- temp_store=MEMORY: Keep temporary tables/indices in RAM
+- mmap_size=30000000000: Memory-mapped reads for large range scans
+- busy_timeout=5000: Wait up to 5s on a locked database instead of failing
+- journal_size_limit=6144000: Truncate the WAL file back to ~6MB after checkpoints
 - row_factory=Row: Dictionary-like row access
+- cached_statements=256: Keep more prepared statements per connection
+
+Connections are opened once per thread and reused. Pragmas are applied
+only when the connection is first created, so individual queries no longer
+pay the connect + pragma round-trips.
 """
 
+import atexit
 import sqlite3
+import threading
 from pathlib import Path
 from contextlib import contextmanager
 from typing import Generator
@@ -20,16 +32,82 @@ from typing import Generator
 # Single source of truth for database path
 DB_PATH = Path(__file__).parent / "trades.db"
 
+# Applied once when a connection is opened (see module docstring)
+_CONNECTION_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA mmap_size=30000000000;
+PRAGMA cache_size=-64000;
+PRAGMA temp_store=MEMORY;
+PRAGMA busy_timeout=5000;
+PRAGMA journal_size_limit=6144000;
+"""
+
+# Per-thread connection cache (sqlite3 connections are not shareable across threads)
+_local = threading.local()
+
+
+def _open_connection() -> sqlite3.Connection:
+    """Open and configure a new database connection."""
+    # isolation_level=None: transactions are managed explicitly by
+    # get_db_connection() so that nested blocks can use SAVEPOINTs
+    # cached_statements: larger prepared-statement LRU for the reused connection
+    conn = sqlite3.connect(str(DB_PATH), isolation_level=None, cached_statements=256)
+    conn.row_factory = sqlite3.Row  # Enable dict-like row access
+
+    # Apply the full pragma set in a single round-trip
+    conn.executescript(_CONNECTION_PRAGMAS)
+
+    return conn
+
+
+def _get_thread_connection() -> sqlite3.Connection:
+    """Return this thread's cached connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = _open_connection()
+        _local.conn = conn
+        _local.path = DB_PATH
+        _local.depth = 0
+    return conn
+
+
+def close_db_connection():
+    """
+    Close the calling thread's cached connection (if any).
+
+    Runs PRAGMA optimize first so the query planner statistics stay fresh
+    for long-lived connections. Safe to call multiple times. The next
+    get_db_connection() call in this thread opens a fresh connection.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _local.conn = None
+        _local.depth = 0
+        try:
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+
 
 @contextmanager
-def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
+def get_db_connection(immediate: bool = False) -> Generator[sqlite3.Connection, None, None]:
     """
     Context manager for database connections with optimized settings.
 
     Provides automatic transaction management:
     - Auto-commits on successful completion
     - Auto-rollbacks on exceptions
-    - Auto-closes connection in all cases
+    - Reuses a per-thread connection (not closed on exit)
+    - Nested blocks run inside SAVEPOINTs of the enclosing transaction
+
+    Args:
+        immediate: Start the outermost transaction with BEGIN IMMEDIATE,
+            taking the write lock up front. Use for write batches so the
+            whole batch commits once and never fails mid-way on lock upgrade.
+            Ignored for nested blocks.
 
     Yields:
         sqlite3.Connection: Configured database connection with:
@@ -46,23 +124,40 @@ def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
     Performance Notes:
         - WAL mode allows readers during writes
         - NORMAL sync trades absolute durability for speed
+        - Pragmas run once per thread, not once per call
         - Safe for development and paper trading
         - Consider FULL sync for live trading with real money
     """
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row  # Enable dict-like row access
-
-    # Performance optimization: Write-Ahead Logging
-    conn.execute("PRAGMA journal_mode=WAL")
+    conn = _get_thread_connection()
+    depth = _local.depth
 
-    # Performance optimization: Balanced sync mode
-    conn.execute("PRAGMA synchronous=NORMAL")
+    if depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    else:
+        conn.execute(f"SAVEPOINT sp_{depth}")
+    _local.depth = depth + 1
 
     try:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
+    except BaseException:
+        _local.depth = depth
+        if depth == 0:
+            conn.rollback()
+        else:
+            conn.execute(f"ROLLBACK TO sp_{depth}")
+            conn.execute(f"RELEASE sp_{depth}")
         raise
-    finally:
-        conn.close()
+
+    _local.depth = depth
+    if depth == 0:
+        try:
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        conn.execute(f"RELEASE sp_{depth}")
+
+
+# Close (and optimize) the main thread's connection at interpreter exit
+atexit.register(close_db_connection)
@@ -5,24 +5,129 @@ Provides functions to interact with SQLite database for persistent storage.
 """
 
 import sqlite3
-import json
+import orjson
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 
 # Import unified database configuration
 from .db_config import get_db_connection, DB_PATH
+from .market_data_manager import timestamp_to_epoch
 
 
-def initialize_database():
-    """Initialize database with schema if it doesn't exist."""
+# Version of schema.sql recorded in PRAGMA user_version
+SCHEMA_VERSION = 3
+
+# Accept the same inputs json.dumps did (int keys, NumPy scalars)
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Hot-path SQL kept as module constants so every call reuses the same
+# string and hits the connection's prepared-statement cache
+_SQL_INSERT_TRADE = """
+    INSERT INTO trades (
+        timestamp, symbol, strategy, signal_source, legs,
+        max_risk, capital_required, confidence, reasoning,
+        order_id, status, fill_price, pnl, metadata
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_SAFETY = """
+    INSERT INTO safety_events (timestamp, event_type, details, action_taken)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Fixed filter queries: a NULL parameter disables its filter, so one
+# prepared statement serves every filter combination
+_SQL_QUERY_TRADES = """
+    SELECT * FROM trades
+    WHERE (:symbol IS NULL OR symbol = :symbol)
+      AND (:status IS NULL OR status = :status)
+      AND (:start_date IS NULL OR timestamp >= :start_date)
+      AND (:end_date IS NULL OR timestamp <= :end_date)
+    ORDER BY timestamp DESC
+    LIMIT :limit
+"""
+
+_SQL_QUERY_SAFETY_EVENTS = """
+    SELECT * FROM safety_events
+    WHERE (:event_type IS NULL OR event_type = :event_type)
+      AND (:start_date IS NULL OR timestamp >= :start_date)
+    ORDER BY timestamp DESC
+    LIMIT :limit
+"""
+
+
+def initialize_database(force: bool = False):
+    """
+    Initialize database with schema if it doesn't exist.
+
+    The applied schema version is recorded in PRAGMA user_version. When it
+    is already current, schema.sql is not read or executed, so the call
+    (including the one at module import) costs a single PRAGMA query.
+    Bump SCHEMA_VERSION whenever schema.sql changes.
+
+    Args:
+        force: Re-apply schema.sql even if the recorded version is current
+    """
+    with get_db_connection() as conn:
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    if current_version >= SCHEMA_VERSION and not force:
+        return
+
     schema_path = Path(__file__).parent / "schema.sql"
 
     with open(schema_path, 'r') as f:
         schema_sql = f.read()
 
+    # One transaction for migration, schema and version bump, so a failure
+    # leaves the database at the old version rather than half-upgraded
     with get_db_connection() as conn:
-        conn.executescript(schema_sql)
+        _migrate_bar_epoch(conn)
+        for statement in _split_statements(schema_sql):
+            conn.execute(statement)
+
+        # Refresh planner statistics so the covering indexes get picked.
+        # analysis_limit keeps ANALYZE bounded on large tables.
+        conn.execute("PRAGMA analysis_limit=400")
+        conn.execute("ANALYZE")
+
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _split_statements(sql: str) -> List[str]:
+    """
+    Split a SQL script into complete statements.
+
+    The statements are run with conn.execute rather than executescript,
+    which COMMITs any open transaction first and would break the
+    BEGIN/SAVEPOINT bookkeeping of get_db_connection().
+    """
+    statements = []
+    buffer = ""
+    for line in sql.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer)
+            buffer = ""
+    return statements
+
+
+def _migrate_bar_epoch(conn: sqlite3.Connection):
+    """
+    Add and backfill market_data_bars.ts_epoch on databases created before
+    schema version 2. Must run before schema.sql, which indexes the column.
+    """
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(market_data_bars)")}
+    if not columns or "ts_epoch" in columns:
+        return  # Fresh database or already migrated
+
+    conn.execute("ALTER TABLE market_data_bars ADD COLUMN ts_epoch INTEGER")
+    rows = conn.execute("SELECT id, timestamp FROM market_data_bars").fetchall()
+    conn.executemany(
+        "UPDATE market_data_bars SET ts_epoch = ? WHERE id = ?",
+        [(timestamp_to_epoch(row["timestamp"]), row["id"]) for row in rows]
+    )
 
 
 def log_trade(
@@ -62,18 +167,12 @@ def log_trade(
         trade_id: Database row ID
     """
     timestamp = datetime.now().isoformat()
-    legs_json = json.dumps(legs)
-    metadata_json = json.dumps(metadata) if metadata else None
+    legs_json = orjson.dumps(legs, option=_ORJSON_OPTS).decode()
+    metadata_json = orjson.dumps(metadata, option=_ORJSON_OPTS).decode() if metadata else None
 
     with get_db_connection() as conn:
         cursor = conn.execute(
-            """
-            INSERT INTO trades (
-                timestamp, symbol, strategy, signal_source, legs,
-                max_risk, capital_required, confidence, reasoning,
-                order_id, status, fill_price, pnl, metadata
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+            _SQL_INSERT_TRADE,
             (
                 timestamp, symbol, strategy, signal_source, legs_json,
                 max_risk, capital_required, confidence, reasoning,
@@ -100,16 +199,28 @@ def update_trade_status(
         fill_price: Fill price (if filled)
         pnl: Profit/loss (if closed)
     """
+    # Only write the columns that were actually provided
+    sets = ["status = ?"]
+    params: List[Any] = [status]
+
+    if order_id is not None:
+        sets.append("order_id = ?")
+        params.append(order_id)
+
+    if fill_price is not None:
+        sets.append("fill_price = ?")
+        params.append(fill_price)
+
+    if pnl is not None:
+        sets.append("pnl = ?")
+        params.append(pnl)
+
+    params.append(trade_id)
+
     with get_db_connection() as conn:
         conn.execute(
-            """
-            UPDATE trades
-            SET status = ?, order_id = COALESCE(?, order_id),
-                fill_price = COALESCE(?, fill_price),
-                pnl = COALESCE(?, pnl)
-            WHERE trade_id = ?
-            """,
-            (status, order_id, fill_price, pnl, trade_id)
+            f"UPDATE trades SET {', '.join(sets)} WHERE trade_id = ?",
+            params
         )
 
 
@@ -130,14 +241,11 @@ def log_safety_event(
         event_id: Database row ID
     """
     timestamp = datetime.now().isoformat()
-    details_json = json.dumps(details)
+    details_json = orjson.dumps(details, option=_ORJSON_OPTS).decode()
 
     with get_db_connection() as conn:
         cursor = conn.execute(
-            """
-            INSERT INTO safety_events (timestamp, event_type, details, action_taken)
-            VALUES (?, ?, ?, ?)
-            """,
+            _SQL_INSERT_SAFETY,
             (timestamp, event_type, details_json, action_taken)
         )
         return cursor.lastrowid
@@ -163,30 +271,16 @@ def query_trades(
     Returns:
         List of trade dictionaries
     """
-    query = "SELECT * FROM trades WHERE 1=1"
-    params = []
-
-    if symbol:
-        query += " AND symbol = ?"
-        params.append(symbol)
-
-    if status:
-        query += " AND status = ?"
-        params.append(status)
-
-    if start_date:
-        query += " AND timestamp >= ?"
-        params.append(start_date)
-
-    if end_date:
-        query += " AND timestamp <= ?"
-        params.append(end_date)
-
-    query += " ORDER BY timestamp DESC LIMIT ?"
-    params.append(limit)
+    params = {
+        "symbol": symbol or None,
+        "status": status or None,
+        "start_date": start_date or None,
+        "end_date": end_date or None,
+        "limit": limit,
+    }
 
     with get_db_connection() as conn:
-        cursor = conn.execute(query, params)
+        cursor = conn.execute(_SQL_QUERY_TRADES, params)
         return [dict(row) for row in cursor.fetchall()]
 
 
@@ -206,22 +300,14 @@ def query_safety_events(
     Returns:
         List of safety event dictionaries
     """
-    query = "SELECT * FROM safety_events WHERE 1=1"
-    params = []
-
-    if event_type:
-        query += " AND event_type = ?"
-        params.append(event_type)
-
-    if start_date:
-        query += " AND timestamp >= ?"
-        params.append(start_date)
-
-    query += " ORDER BY timestamp DESC LIMIT ?"
-    params.append(limit)
+    params = {
+        "event_type": event_type or None,
+        "start_date": start_date or None,
+        "limit": limit,
+    }
 
     with get_db_connection() as conn:
-        cursor = conn.execute(query, params)
+        cursor = conn.execute(_SQL_QUERY_SAFETY_EVENTS, params)
         return [dict(row) for row in cursor.fetchall()]
 
 
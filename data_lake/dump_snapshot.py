@@ -0,0 +1,29 @@
+"""
+Print a swarm snapshot as plain JSON.
+
+Snapshots are stored zstd-compressed with the agent response in a separate
+sidecar file; this decompresses one and merges its response.
+
+Usage:
+    python -m data_lake.dump_snapshot 20251120T093045_tech_aggressive
+"""
+
+import sys
+
+import orjson
+
+from .snapshot_manager import load_snapshot
+
+
+def dump_snapshot(snapshot_id: str) -> bytes:
+    """Return a snapshot (response merged) as indented JSON"""
+    return orjson.dumps(
+        load_snapshot(snapshot_id),
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m data_lake.dump_snapshot <snapshot_id>")
+    sys.stdout.buffer.write(dump_snapshot(sys.argv[1]) + b"\n")
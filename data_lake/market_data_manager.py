@@ -5,23 +5,188 @@ Provides storage and retrieval functions for historical OHLCV market data.
 Supports 5-minute base granularity with on-the-fly aggregation to larger intervals.
 """
 
+import atexit
+import logging
+import queue
 import sqlite3
-import json
+import threading
+import time
+import orjson
 import pytz
+import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Sequence
 from dataclasses import dataclass
 
 # Import unified database configuration
 from .db_config import get_db_connection
 
+logger = logging.getLogger(__name__)
+
 # Timezone constants
 ET = pytz.timezone('US/Eastern')
 
+# Deferred freshness updates: insert_bars enqueues (symbol, dirty_since) and a
+# background worker applies them, coalesced per symbol, every interval
+_FRESHNESS_FLUSH_INTERVAL = 5.0
+_freshness_queue: "queue.Queue[Tuple[str, int]]" = queue.Queue()
+_freshness_lock = threading.Lock()
+_freshness_worker: Optional[threading.Thread] = None
+
+# Column names and dtypes returned by get_bars_soa()
+_SOA_COLUMNS = (
+    ("timestamp", str),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.int64),
+    ("vwap", np.float64),
+)
+
+# Hot-path SQL kept as module constants so every call reuses the same
+# string and hits the connection's prepared-statement cache
+# Rows identical to the stored bar are skipped instead of being rewritten
+_SQL_INSERT_BAR = """
+INSERT INTO market_data_bars
+(symbol, timestamp, ts_epoch, open, high, low, close, volume, vwap)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol, timestamp) DO UPDATE SET
+    ts_epoch = excluded.ts_epoch,
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    volume = excluded.volume,
+    vwap = excluded.vwap
+WHERE market_data_bars.open != excluded.open
+   OR market_data_bars.high != excluded.high
+   OR market_data_bars.low != excluded.low
+   OR market_data_bars.close != excluded.close
+   OR market_data_bars.volume != excluded.volume
+   OR market_data_bars.vwap IS NOT excluded.vwap
+   OR market_data_bars.ts_epoch IS NOT excluded.ts_epoch
+"""
+
+# Large batches are shipped as one JSON array and fanned out by SQLite,
+# binding a single parameter instead of 9 per row. "WHERE true" resolves the
+# INSERT ... SELECT ... ON CONFLICT parsing ambiguity.
+_SQL_INSERT_BARS_JSON = """
+INSERT INTO market_data_bars
+(symbol, timestamp, ts_epoch, open, high, low, close, volume, vwap)
+SELECT value ->> 0, value ->> 1, value ->> 2, value ->> 3, value ->> 4,
+       value ->> 5, value ->> 6, value ->> 7, value ->> 8
+FROM json_each(?)
+WHERE true
+ON CONFLICT(symbol, timestamp) DO UPDATE SET
+    ts_epoch = excluded.ts_epoch,
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    volume = excluded.volume,
+    vwap = excluded.vwap
+WHERE market_data_bars.open != excluded.open
+   OR market_data_bars.high != excluded.high
+   OR market_data_bars.low != excluded.low
+   OR market_data_bars.close != excluded.close
+   OR market_data_bars.volume != excluded.volume
+   OR market_data_bars.vwap IS NOT excluded.vwap
+   OR market_data_bars.ts_epoch IS NOT excluded.ts_epoch
+"""
+
+# Batches at least this large use _SQL_INSERT_BARS_JSON instead of executemany
+_BULK_INSERT_THRESHOLD = 1000
+
+_SQL_LATEST_BAR = """
+SELECT symbol, timestamp, open, high, low, close, volume, vwap
+FROM market_data_bars
+WHERE symbol = ?
+ORDER BY timestamp DESC
+LIMIT 1
+"""
+
+# Expected: 5 minutes apart during trading hours.
+# Simplified: flag if gap > 10 minutes (allows for market close).
+# Uses the integer ts_epoch column, so no timestamp parsing is needed.
+_SQL_DETECT_GAPS = """
+SELECT start_ts, end_ts, gap_sec
+FROM (
+    SELECT
+        LAG(timestamp) OVER w AS start_ts,
+        timestamp AS end_ts,
+        ts_epoch,
+        ts_epoch - LAG(ts_epoch) OVER w AS gap_sec
+    FROM market_data_bars
+    WHERE symbol = :symbol AND (:since IS NULL OR ts_epoch >= :since)
+    WINDOW w AS (ORDER BY ts_epoch)
+)
+WHERE gap_sec > 600
+ORDER BY ts_epoch
+"""
+
+# Recomputes coverage for every active symbol with bars in one grouped pass
+# (creating missing freshness rows) and keeps only the stored gaps that start
+# at or after the retention cutoff. "WHERE true" resolves the
+# INSERT ... SELECT ... ON CONFLICT parsing ambiguity.
+_SQL_REFRESH_FRESHNESS = """
+INSERT INTO data_freshness (symbol, oldest_bar, newest_bar, bar_count, last_checked)
+SELECT symbol, MIN(timestamp), MAX(timestamp), COUNT(*), :now
+FROM market_data_bars
+WHERE symbol IN (SELECT symbol FROM watchlist WHERE active = 1) AND true
+GROUP BY symbol
+ON CONFLICT(symbol) DO UPDATE SET
+    oldest_bar = excluded.oldest_bar,
+    newest_bar = excluded.newest_bar,
+    bar_count = excluded.bar_count,
+    last_checked = excluded.last_checked,
+    gaps_detected = (
+        SELECT CASE WHEN COUNT(*) = 0 THEN NULL
+                    ELSE json_object('gaps', json_group_array(json(value)))
+               END
+        FROM json_each(data_freshness.gaps_detected, '$.gaps')
+        WHERE json_extract(value, '$.start') >= :cutoff
+    )
+"""
+
+# Aggregates consecutive groups of `period` 5-min bars (same grouping as
+# aggregate_bars): first open, max high, min low, last close, summed volume
+# and the price*volume sum used for VWAP
+_SQL_AGGREGATE_BARS = """
+WITH numbered AS (
+    SELECT symbol, timestamp, open, high, low, close, volume,
+           (ROW_NUMBER() OVER (ORDER BY timestamp) - 1) / :period AS bucket
+    FROM market_data_bars
+    WHERE symbol = :symbol AND timestamp >= :start AND timestamp <= :end
+),
+framed AS (
+    SELECT *,
+           FIRST_VALUE(open) OVER w AS first_open,
+           LAST_VALUE(close) OVER w AS last_close
+    FROM numbered
+    WINDOW w AS (
+        PARTITION BY bucket ORDER BY timestamp
+        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    )
+)
+SELECT
+    MIN(symbol) AS symbol,
+    MIN(timestamp) AS timestamp,
+    MIN(first_open) AS open,
+    MAX(high) AS high,
+    MIN(low) AS low,
+    MIN(last_close) AS close,
+    SUM(volume) AS volume,
+    SUM(((high + low + close) / 3.0) * volume) AS pv
+FROM framed
+GROUP BY bucket
+ORDER BY bucket
+"""
+
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OHLCVBar:
-    """Represents a single OHLCV bar"""
+    """Represents a single OHLCV bar (immutable, slotted: no per-instance __dict__)"""
     symbol: str
     timestamp: str  # ISO format
     open: float
@@ -44,45 +209,61 @@ class OHLCVBar:
         }
 
 
+def timestamp_to_epoch(timestamp: str) -> int:
+    """
+    Convert a stored ISO timestamp to epoch seconds.
+
+    Naive timestamps are interpreted as US/Eastern, matching how bars are
+    written by the sync and backfill jobs.
+    """
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None:
+        dt = ET.localize(dt)
+    return int(dt.timestamp())
+
+
 def insert_bars(symbol: str, bars: List[OHLCVBar]) -> int:
     """
     Insert OHLCV bars into the database.
-    Uses batch insert with UPSERT logic (INSERT OR REPLACE).
+    Uses batch insert with UPSERT logic (INSERT ... ON CONFLICT DO UPDATE);
+    bars identical to the stored row are left untouched.
+
+    The insert runs in a single BEGIN IMMEDIATE transaction, so the whole
+    batch costs one commit. Large batches are sent to SQLite as a single
+    JSON array rather than bound row by row. The data_freshness update is
+    deferred to a background worker (see flush_freshness_updates()).
 
     Args:
         symbol: Stock symbol (e.g., "AAPL")
         bars: List of OHLCVBar objects
 
     Returns:
-        Number of bars inserted/updated
+        Number of bars inserted/updated (unchanged bars are not counted)
     """
     if not bars:
         return 0
 
-    with get_db_connection() as conn:
+    with get_db_connection(immediate=True) as conn:
         cursor = conn.cursor()
 
         # Batch insert with UPSERT
-        insert_sql = """
-        INSERT OR REPLACE INTO market_data_bars
-        (symbol, timestamp, open, high, low, close, volume, vwap)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-
         batch_data = [
-            (bar.symbol, bar.timestamp, bar.open, bar.high, bar.low,
-             bar.close, bar.volume, bar.vwap)
+            (bar.symbol, bar.timestamp, timestamp_to_epoch(bar.timestamp),
+             bar.open, bar.high, bar.low, bar.close, bar.volume, bar.vwap)
             for bar in bars
         ]
 
-        cursor.executemany(insert_sql, batch_data)
+        if len(batch_data) >= _BULK_INSERT_THRESHOLD:
+            cursor.execute(_SQL_INSERT_BARS_JSON, (orjson.dumps(batch_data, option=orjson.OPT_SERIALIZE_NUMPY),))
+        else:
+            cursor.executemany(_SQL_INSERT_BAR, batch_data)
 
         rows_affected = cursor.rowcount
 
-        # Update data_freshness
-        _update_freshness(conn, symbol)
+    # Update data_freshness off the insert path (gap scan limited to the new tail)
+    _enqueue_freshness_update(symbol, min(row[2] for row in batch_data))
 
-        return rows_affected
+    return rows_affected
 
 
 def get_bars(
@@ -95,6 +276,9 @@ def get_bars(
     Query historical bars for a symbol within a date range.
     Supports on-the-fly aggregation to larger intervals.
 
+    Aggregated intervals are computed in SQL, so only the aggregated rows
+    are transferred into Python.
+
     Args:
         symbol: Stock symbol (e.g., "AAPL")
         start: Start datetime
@@ -104,40 +288,96 @@ def get_bars(
     Returns:
         List of OHLCVBar objects
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
+    return [OHLCVBar(*row) for row in _fetch_bar_rows(symbol, start, end, interval)]
 
-        # Query 5-minute bars
-        query = """
-        SELECT symbol, timestamp, open, high, low, close, volume, vwap
-        FROM market_data_bars
-        WHERE symbol = ? AND timestamp >= ? AND timestamp <= ?
-        ORDER BY timestamp ASC
-        """
 
-        cursor.execute(query, (symbol, start.isoformat(), end.isoformat()))
-        rows = cursor.fetchall()
+def get_bars_soa(
+    symbol: str,
+    start: datetime,
+    end: datetime,
+    interval: str = "5min"
+) -> Dict[str, np.ndarray]:
+    """
+    Query historical bars as parallel column arrays (struct-of-arrays).
 
-        # Convert to OHLCVBar objects
-        bars_5min = [
-            OHLCVBar(
-                symbol=row["symbol"],
-                timestamp=row["timestamp"],
-                open=row["open"],
-                high=row["high"],
-                low=row["low"],
-                close=row["close"],
-                volume=row["volume"],
-                vwap=row["vwap"]
-            )
-            for row in rows
-        ]
+    Same rows as get_bars(), but returned as one NumPy array per column so
+    analysis code can use vectorized reductions without building objects.
 
-    # Aggregate if needed
+    Args:
+        symbol: Stock symbol (e.g., "AAPL")
+        start: Start datetime
+        end: End datetime
+        interval: Bar interval - "5min", "15min", "1h", or "daily"
+
+    Returns:
+        Dict with keys 'timestamp' (str array), 'open', 'high', 'low',
+        'close', 'vwap' (float64; missing VWAP is NaN) and 'volume' (int64).
+        Arrays are empty when no bars match.
+    """
+    rows = _fetch_bar_rows(symbol, start, end, interval)
+    if not rows:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in _SOA_COLUMNS}
+
+    # columns[0] is the symbol, which is constant for the query
+    columns = list(zip(*rows))
+    return {
+        name: np.asarray(
+            [np.nan if v is None else v for v in col] if name == "vwap" else col,
+            dtype=dtype
+        )
+        for (name, dtype), col in zip(_SOA_COLUMNS, columns[1:])
+    }
+
+
+def _fetch_bar_rows(
+    symbol: str,
+    start: datetime,
+    end: datetime,
+    interval: str
+) -> List[Tuple]:
+    """
+    Fetch bar rows ordered by timestamp as
+    (symbol, timestamp, open, high, low, close, volume, vwap) sequences.
+    """
     if interval == "5min":
-        return bars_5min
-    else:
-        return aggregate_bars(bars_5min, interval)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            # Query 5-minute bars
+            query = """
+            SELECT symbol, timestamp, open, high, low, close, volume, vwap
+            FROM market_data_bars
+            WHERE symbol = ? AND timestamp >= ? AND timestamp <= ?
+            ORDER BY timestamp ASC
+            """
+
+            cursor.execute(query, (symbol, start.isoformat(), end.isoformat()))
+            return cursor.fetchall()
+
+    # Aggregate inside SQLite so only the aggregated rows reach Python
+    period = _aggregation_period(interval)
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            _SQL_AGGREGATE_BARS,
+            {
+                "symbol": symbol,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "period": period,
+            }
+        )
+        rows = cursor.fetchall()
+
+    return [
+        (
+            row["symbol"], row["timestamp"], row["open"], row["high"],
+            row["low"], row["close"], row["volume"],
+            round(row["pv"] / row["volume"], 2) if row["volume"] else None
+        )
+        for row in rows
+    ]
 
 
 def aggregate_bars(bars_5min: List[OHLCVBar], target_interval: str) -> List[OHLCVBar]:
@@ -154,6 +394,22 @@ def aggregate_bars(bars_5min: List[OHLCVBar], target_interval: str) -> List[OHLC
     if not bars_5min or target_interval == "5min":
         return bars_5min
 
+    period = _aggregation_period(target_interval)
+
+    return _aggregate_columns(
+        [b.symbol for b in bars_5min],
+        [b.timestamp for b in bars_5min],
+        [b.open for b in bars_5min],
+        [b.high for b in bars_5min],
+        [b.low for b in bars_5min],
+        [b.close for b in bars_5min],
+        [b.volume for b in bars_5min],
+        period
+    )
+
+
+def _aggregation_period(target_interval: str) -> int:
+    """Return the number of 5-min bars per aggregated bar"""
     # Determine aggregation period (number of 5-min bars)
     period_map = {
         "15min": 3,    # 15min = 3 × 5min
@@ -164,52 +420,65 @@ def aggregate_bars(bars_5min: List[OHLCVBar], target_interval: str) -> List[OHLC
     if target_interval not in period_map:
         raise ValueError(f"Unsupported interval: {target_interval}")
 
-    period = period_map[target_interval]
-    aggregated = []
-
-    for i in range(0, len(bars_5min), period):
-        chunk = bars_5min[i:i + period]
-        if not chunk:
-            continue
-
-        # Aggregate OHLCV
-        agg_bar = OHLCVBar(
-            symbol=chunk[0].symbol,
-            timestamp=chunk[0].timestamp,  # Use first bar's timestamp
-            open=chunk[0].open,            # First bar's open
-            high=max(b.high for b in chunk),  # Max high
-            low=min(b.low for b in chunk),    # Min low
-            close=chunk[-1].close,         # Last bar's close
-            volume=sum(b.volume for b in chunk),  # Sum volume
-            vwap=_calculate_vwap(chunk)    # Recalculate VWAP
-        )
-        aggregated.append(agg_bar)
-
-    return aggregated
-
-
-def _calculate_vwap(bars: List[OHLCVBar]) -> Optional[float]:
-    """Calculate volume-weighted average price for a list of bars"""
-    if not bars:
-        return None
+    return period_map[target_interval]
 
-    total_volume = sum(b.volume for b in bars)
-    if total_volume == 0:
-        return None
 
-    # Use typical price (H+L+C)/3 weighted by volume
-    vwap = sum(
-        ((b.high + b.low + b.close) / 3) * b.volume
-        for b in bars
-    ) / total_volume
+def _aggregate_columns(
+    symbols: Sequence[str],
+    timestamps: Sequence[str],
+    opens: Sequence[float],
+    highs: Sequence[float],
+    lows: Sequence[float],
+    closes: Sequence[float],
+    volumes: Sequence[int],
+    period: int
+) -> List[OHLCVBar]:
+    """
+    Aggregate column-oriented 5-min data into bars of `period` rows each.
 
-    return round(vwap, 2)
+    High/low/volume and VWAP are computed with NumPy segment reductions
+    (one pass per column) instead of per-chunk Python loops.
+    """
+    n = len(timestamps)
+    starts = np.arange(0, n, period)
+    ends = np.minimum(starts + period, n) - 1
+
+    high = np.asarray(highs, dtype=np.float64)
+    low = np.asarray(lows, dtype=np.float64)
+    close = np.asarray(closes, dtype=np.float64)
+    volume = np.asarray(volumes, dtype=np.int64)
+
+    agg_high = np.maximum.reduceat(high, starts).tolist()
+    agg_low = np.minimum.reduceat(low, starts).tolist()
+    agg_volume = np.add.reduceat(volume, starts).tolist()
+
+    # VWAP from typical price (H+L+C)/3 weighted by volume, computed in place
+    typical = np.add(high, low)
+    typical += close
+    typical /= 3
+    typical *= volume
+    agg_pv = np.add.reduceat(typical, starts).tolist()
+
+    # First-bar symbol/timestamp/open and last-bar close per bucket
+    first = starts.tolist()
+    last = ends.tolist()
+
+    return [
+        OHLCVBar(
+            symbols[i], timestamps[i], opens[i], h, l, closes[j], v,
+            round(pv / v, 2) if v else None
+        )
+        for i, j, h, l, v, pv in zip(first, last, agg_high, agg_low, agg_volume, agg_pv)
+    ]
 
 
 def detect_gaps(symbol: str) -> List[Dict[str, str]]:
     """
     Detect gaps in market data for a symbol.
 
+    Gaps are found in a single SQL pass (LAG over the symbol's timestamps),
+    so only the gap rows are returned to Python.
+
     Args:
         symbol: Stock symbol
 
@@ -217,57 +486,74 @@ def detect_gaps(symbol: str) -> List[Dict[str, str]]:
         List of gap dictionaries with 'start', 'end', 'missing_bars'
     """
     with get_db_connection() as conn:
-        cursor = conn.cursor()
+        return _find_gaps(conn, symbol)
 
-        # Get all timestamps for symbol
-        cursor.execute("""
-            SELECT timestamp
-            FROM market_data_bars
-            WHERE symbol = ?
-            ORDER BY timestamp ASC
-        """, (symbol,))
 
-        timestamps = [row["timestamp"] for row in cursor.fetchall()]
-
-    if len(timestamps) < 2:
-        return []
-
-    gaps = []
-    for i in range(len(timestamps) - 1):
-        current = datetime.fromisoformat(timestamps[i])
-        next_ts = datetime.fromisoformat(timestamps[i + 1])
-
-        # Ensure timezone consistency
-        if current.tzinfo is None:
-            current = ET.localize(current)
-        if next_ts.tzinfo is None:
-            next_ts = ET.localize(next_ts)
-
-        # Expected: 5 minutes apart during trading hours
-        # Simplified: flag if gap > 10 minutes (allows for market close)
-        delta = (next_ts - current).total_seconds() / 60
-        if delta > 10:
-            # Potential gap detected
-            gaps.append({
-                "start": timestamps[i],
-                "end": timestamps[i + 1],
-                "missing_bars": int((delta - 5) / 5)  # Approximate
-            })
+def rebuild_gaps(symbol: str) -> List[Dict[str, str]]:
+    """
+    Re-scan all bars for a symbol and store the detected gaps.
+
+    insert_bars only checks the newly appended tail for gaps, so stored gap
+    information can go stale after out-of-order backfills. Run this from
+    periodic maintenance (e.g. nightly) to refresh it.
+
+    Args:
+        symbol: Stock symbol
+
+    Returns:
+        List of gap dictionaries with 'start', 'end', 'missing_bars'
+    """
+    flush_freshness_updates()
+
+    with get_db_connection(immediate=True) as conn:
+        gaps = _find_gaps(conn, symbol)
+        conn.execute("""
+            UPDATE data_freshness
+            SET gaps_detected = ?, last_checked = ?
+            WHERE symbol = ?
+        """, (orjson.dumps({"gaps": gaps}).decode() if gaps else None,
+              datetime.now().isoformat(), symbol))
 
     return gaps
 
 
+def _find_gaps(
+    conn: sqlite3.Connection,
+    symbol: str,
+    since: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """Detect gaps between bars at or after epoch `since` (all bars by default)"""
+    cursor = conn.cursor()
+    cursor.execute(_SQL_DETECT_GAPS, {"symbol": symbol, "since": since})
+
+    return [
+        {
+            "start": row["start_ts"],
+            "end": row["end_ts"],
+            "missing_bars": int((row["gap_sec"] / 60 - 5) / 5)  # Approximate
+        }
+        for row in cursor.fetchall()
+    ]
+
+
 def cleanup_old_data(cutoff_date: datetime) -> int:
     """
     Delete market data older than cutoff_date (3-year retention policy).
 
+    Freshness records of active symbols are recomputed with one grouped
+    INSERT ... SELECT; gaps that started before the cutoff are dropped.
+    Symbols with no remaining bars keep their previous record.
+
     Args:
         cutoff_date: Delete data before this date
 
     Returns:
         Number of rows deleted
     """
-    with get_db_connection() as conn:
+    cutoff = cutoff_date.isoformat()
+
+    # One transaction for the delete and the freshness refresh
+    with get_db_connection(immediate=True) as conn:
         cursor = conn.cursor()
 
         delete_sql = """
@@ -275,22 +561,37 @@ def cleanup_old_data(cutoff_date: datetime) -> int:
         WHERE timestamp < ?
         """
 
-        cursor.execute(delete_sql, (cutoff_date.isoformat(),))
+        cursor.execute(delete_sql, (cutoff,))
 
         rows_deleted = cursor.rowcount
 
         # Update freshness for affected symbols
-        cursor.execute("SELECT DISTINCT symbol FROM watchlist WHERE active = 1")
-        symbols = [row["symbol"] for row in cursor.fetchall()]
-
-        for symbol in symbols:
-            _update_freshness(conn, symbol)
+        cursor.execute(
+            _SQL_REFRESH_FRESHNESS,
+            {"now": datetime.now().isoformat(), "cutoff": cutoff}
+        )
 
         return rows_deleted
 
 
-def _update_freshness(conn: sqlite3.Connection, symbol: str):
-    """Update data_freshness table for a symbol"""
+def _update_freshness(
+    conn: sqlite3.Connection,
+    symbol: str,
+    dirty_since: Optional[int] = None
+):
+    """
+    Update data_freshness table for a symbol.
+
+    Runs inside the caller's transaction and does not commit.
+
+    Args:
+        conn: Open connection (inside a transaction)
+        symbol: Stock symbol
+        dirty_since: Oldest bar (epoch seconds) written since the last update. When it
+            is at or after the previously recorded newest bar, only the new
+            tail is scanned for gaps and merged with the stored gaps;
+            otherwise (or when None) all bars are rescanned.
+    """
     cursor = conn.cursor()
 
     # Get oldest and newest bar timestamps
@@ -312,9 +613,25 @@ def _update_freshness(conn: sqlite3.Connection, symbol: str):
     newest_bar = row["newest"]
     bar_count = row["count"]
 
+    cursor.execute("""
+        SELECT newest_bar, gaps_detected FROM data_freshness WHERE symbol = ?
+    """, (symbol,))
+    previous = cursor.fetchone()
+
     # Detect gaps
-    gaps = detect_gaps(symbol)
-    gaps_json = json.dumps({"gaps": gaps}) if gaps else None
+    previous_newest = (
+        timestamp_to_epoch(previous["newest_bar"])
+        if previous and previous["newest_bar"] else None
+    )
+
+    if (dirty_since is not None and previous_newest is not None
+            and dirty_since >= previous_newest):
+        # Appended at the tail: only the boundary and new bars can add gaps
+        gaps = orjson.loads(previous["gaps_detected"])["gaps"] if previous["gaps_detected"] else []
+        gaps += _find_gaps(conn, symbol, since=previous_newest)
+    else:
+        gaps = _find_gaps(conn, symbol)
+    gaps_json = orjson.dumps({"gaps": gaps}).decode() if gaps else None
 
     # Upsert freshness record
     cursor.execute("""
@@ -324,11 +641,77 @@ def _update_freshness(conn: sqlite3.Connection, symbol: str):
     """, (symbol, oldest_bar, newest_bar, bar_count,
           datetime.now().isoformat(), gaps_json))
 
-    conn.commit()
+
+def _enqueue_freshness_update(symbol: str, dirty_since: int):
+    """Queue a freshness update and start the background worker if needed"""
+    global _freshness_worker
+
+    _freshness_queue.put((symbol, dirty_since))
+
+    if _freshness_worker is None or not _freshness_worker.is_alive():
+        with _freshness_lock:
+            if _freshness_worker is None or not _freshness_worker.is_alive():
+                _freshness_worker = threading.Thread(
+                    target=_freshness_worker_loop,
+                    name="freshness-updater",
+                    daemon=True
+                )
+                _freshness_worker.start()
+
+
+def _freshness_worker_loop():
+    """Background loop applying queued freshness updates"""
+    while True:
+        time.sleep(_FRESHNESS_FLUSH_INTERVAL)
+        try:
+            flush_freshness_updates()
+        except Exception:
+            logger.exception("Failed to apply queued freshness updates")
+
+
+def flush_freshness_updates() -> int:
+    """
+    Apply all queued data_freshness updates now.
+
+    insert_bars defers freshness bookkeeping to a background worker that
+    flushes every few seconds. Pending updates for the same symbol are
+    coalesced into one, keeping the oldest dirty bar so the gap scan still
+    covers every inserted bar. Readers of data_freshness call this first,
+    so they never see stale metadata.
+
+    Returns:
+        Number of symbols updated
+    """
+    with _freshness_lock:
+        pending: Dict[str, int] = {}
+        while True:
+            try:
+                symbol, dirty_since = _freshness_queue.get_nowait()
+            except queue.Empty:
+                break
+            previous = pending.get(symbol)
+            pending[symbol] = dirty_since if previous is None else min(previous, dirty_since)
+
+        if not pending:
+            return 0
+
+        try:
+            with get_db_connection(immediate=True) as conn:
+                for symbol, dirty_since in pending.items():
+                    _update_freshness(conn, symbol, dirty_since=dirty_since)
+        except Exception:
+            # Nothing was committed; requeue so the next flush retries them
+            for item in pending.items():
+                _freshness_queue.put(item)
+            raise
+
+        return len(pending)
 
 
 def get_freshness_info(symbol: str) -> Optional[Dict]:
     """Get data freshness information for a symbol"""
+    flush_freshness_updates()
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
@@ -347,7 +730,7 @@ def get_freshness_info(symbol: str) -> Optional[Dict]:
             "newest_bar": row["newest_bar"],
             "bar_count": row["bar_count"],
             "last_checked": row["last_checked"],
-            "gaps_detected": json.loads(row["gaps_detected"]) if row["gaps_detected"] else {"gaps": []}
+            "gaps_detected": orjson.loads(row["gaps_detected"]) if row["gaps_detected"] else {"gaps": []}
         }
 
 
@@ -356,13 +739,7 @@ def get_latest_bar(symbol: str) -> Optional[OHLCVBar]:
     with get_db_connection() as conn:
         cursor = conn.cursor()
 
-        cursor.execute("""
-            SELECT symbol, timestamp, open, high, low, close, volume, vwap
-            FROM market_data_bars
-            WHERE symbol = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """, (symbol,))
+        cursor.execute(_SQL_LATEST_BAR, (symbol,))
 
         row = cursor.fetchone()
 
@@ -379,3 +756,7 @@ def get_latest_bar(symbol: str) -> Optional[OHLCVBar]:
             volume=row["volume"],
             vwap=row["vwap"]
         )
+
+
+# Apply pending freshness updates before the interpreter exits
+atexit.register(flush_freshness_updates)
@@ -36,6 +36,7 @@ CREATE TABLE IF NOT EXISTS market_data_bars (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     symbol TEXT NOT NULL,
     timestamp TEXT NOT NULL,  -- ISO format: 2025-11-20T09:30:00
+    ts_epoch INTEGER,  -- timestamp as epoch seconds (naive timestamps read as US/Eastern)
     open REAL NOT NULL,
     high REAL NOT NULL,
     low REAL NOT NULL,
@@ -71,12 +72,17 @@ CREATE TABLE IF NOT EXISTS data_freshness (
 CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades(timestamp);
 CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
 CREATE INDEX IF NOT EXISTS idx_trades_status ON trades(status);
+CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades(timestamp DESC, symbol, status);
 CREATE INDEX IF NOT EXISTS idx_safety_events_timestamp ON safety_events(timestamp);
 CREATE INDEX IF NOT EXISTS idx_safety_events_type ON safety_events(event_type);
 
 -- Indexes for market data queries
 CREATE INDEX IF NOT EXISTS idx_bars_symbol ON market_data_bars(symbol);
 CREATE INDEX IF NOT EXISTS idx_bars_timestamp ON market_data_bars(timestamp);
-CREATE INDEX IF NOT EXISTS idx_bars_symbol_timestamp ON market_data_bars(symbol, timestamp);
+CREATE INDEX IF NOT EXISTS idx_bars_symbol_epoch ON market_data_bars(symbol, ts_epoch, timestamp);
+-- Covering index: range scans by symbol/timestamp are answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_bars_symbol_ts_cover ON market_data_bars(symbol, timestamp, open, high, low, close, volume, vwap);
+-- Superseded by idx_bars_symbol_ts_cover; dropped so bar inserts maintain one index fewer
+DROP INDEX IF EXISTS idx_bars_symbol_timestamp;
 CREATE INDEX IF NOT EXISTS idx_watchlist_active ON watchlist(active);
 CREATE INDEX IF NOT EXISTS idx_watchlist_priority ON watchlist(priority DESC);
@@ -35,28 +35,27 @@ def seed_initial_watchlist() -> int:
     Returns:
         Number of symbols added
     """
-    with get_db_connection() as conn:
+    with get_db_connection(immediate=True) as conn:
         cursor = conn.cursor()
 
-        # Check if watchlist already has data
-        cursor.execute("SELECT COUNT(*) as count FROM watchlist")
-        existing_count = cursor.fetchone()["count"]
+        # Check if watchlist already has data (stops at the first row)
+        cursor.execute("SELECT 1 FROM watchlist LIMIT 1")
 
-        if existing_count > 0:
+        if cursor.fetchone() is not None:
             return 0  # Already seeded
 
-        # Insert initial symbols
+        # Insert initial symbols in a single batch
         now = datetime.now().isoformat()
-        added = 0
 
-        for entry in INITIAL_SYMBOLS:
-            cursor.execute("""
-                INSERT INTO watchlist (symbol, added_at, active, priority, notes)
-                VALUES (?, ?, 1, ?, ?)
-            """, (entry["symbol"], now, entry["priority"], entry["notes"]))
-            added += 1
+        cursor.executemany("""
+            INSERT INTO watchlist (symbol, added_at, active, priority, notes)
+            VALUES (?, ?, 1, ?, ?)
+        """, [
+            (entry["symbol"], now, entry["priority"], entry["notes"])
+            for entry in INITIAL_SYMBOLS
+        ])
 
-        return added
+        return len(INITIAL_SYMBOLS)
 
 
 if __name__ == "__main__":
@@ -4,42 +4,349 @@ Snapshot storage manager for swarm decision logging.
 Provides functions to save and load complete decision contexts for auditability.
 """
 
-import json
+import mmap
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import orjson
+import zstandard
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from jinja2 import Undefined, StrictUndefined
+from typing import Dict, List, Optional, Any, Tuple
+from jinja2 import Undefined
 
 
 SNAPSHOTS_DIR = Path(__file__).parent / "snapshots"
 
+# Snapshots are written zstd-compressed; uncompressed files from older
+# versions are still read (and replaced on update)
+_SNAPSHOT_SUFFIX = ".json.zst"
+_LEGACY_SNAPSHOT_SUFFIX = ".json"
+_ZSTD_LEVEL = 3
+
+# agent_response is stored next to the snapshot in <id>.response.json, so
+# updating it never rewrites the (large) snapshot file
+_RESPONSE_SUFFIX = ".response.json"
+
+# Per-thread reusable state: zstd contexts (not thread-safe) and the
+# write scratch buffer
+_local = threading.local()
+
+# Size of the per-thread scratch buffer that coalesces small writes
+_SCRATCH_SIZE = 256 * 1024
+
+# Compact timestamp prefix of snapshot IDs (ISO timestamp without ":", "-"
+# and fractional seconds)
+_SNAPSHOT_ID_TIME_FORMAT = "%Y%m%dT%H%M%S"
+_SNAPSHOT_ID_STRIP = str.maketrans("", "", ":-")
+
+# Append-only list of saved snapshot IDs (one per line) inside SNAPSHOTS_DIR,
+# read by list_snapshots() instead of globbing the directory
+_SNAPSHOT_INDEX_NAME = "_index.txt"
+
+# ((index path, mtime_ns, size), sorted snapshot IDs) of the last index read
+_index_cache: Optional[Tuple[Tuple[Path, int, int], List[str]]] = None
+
+# Dict levels streamed member by member when writing (snapshot envelope and
+# its market_data)
+_STREAM_DEPTH = 2
+
+# Uncompressed snapshots at least this large are parsed straight from a memory map
+_MMAP_MIN_SIZE = 64 * 1024
+
+# Pretty-printed like the former json.dump(indent=2) output; non-str keys and
+# NumPy values are accepted as they appear in market_data
+_ORJSON_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _undefined_default(obj: Any) -> Any:
+    """
+    orjson default hook: serialize Jinja2 Undefined objects as "<undefined>".
+
+    orjson only calls this for objects it cannot serialize natively, so
+    plain dicts/lists/scalars never reach Python code.
+    """
+    if isinstance(obj, Undefined):
+        return "<undefined>"
+    raise TypeError
+
+
+class _ScratchWriter:
+    """
+    Coalesce writes into this thread's reusable scratch buffer.
+
+    Buffered data is passed to sink() whenever the buffer fills; chunks
+    larger than the buffer bypass it. The buffer is allocated once per
+    thread instead of once per snapshot.
+    """
+
+    __slots__ = ("_sink", "_buf", "_view", "_pos")
+
+    def __init__(self, sink):
+        buf = getattr(_local, "scratch", None)
+        if buf is None:
+            buf = _local.scratch = bytearray(_SCRATCH_SIZE)
+        self._sink = sink
+        self._buf = buf
+        self._view = memoryview(buf)
+        self._pos = 0
+
+    def write(self, data: bytes):
+        size = len(data)
+        if self._pos + size > _SCRATCH_SIZE:
+            self.flush()
+        if size >= _SCRATCH_SIZE:
+            self._sink(data)
+            return
+        self._buf[self._pos:self._pos + size] = data
+        self._pos += size
+
+    def flush(self):
+        if self._pos:
+            self._sink(self._view[:self._pos])
+            self._pos = 0
+
+    def close(self):
+        self.flush()
+        self._view.release()
+
+
+def _write_json_stream(write, obj: Any, level: int, stream_depth: int):
+    """
+    Serialize obj through write() piece by piece.
+
+    The top `stream_depth` levels of str-keyed dicts are emitted member by
+    member, so only one member (e.g. the rendered prompt or one symbol's
+    market data) is held as an encoded buffer at a time. The output is
+    byte-identical to orjson.dumps(obj) with _ORJSON_OPTS.
+    """
+    if (stream_depth > 0 and type(obj) is dict and obj
+            and all(type(key) is str for key in obj)):
+        indent = b"\n" + b"  " * (level + 1)
+        separator = b"{"
+        for key, value in obj.items():
+            write(separator)
+            write(indent)
+            write(orjson.dumps(key))
+            write(b": ")
+            _write_json_stream(write, value, level + 1, stream_depth - 1)
+            separator = b","
+        write(b"\n" + b"  " * level + b"}")
+        return
+
+    encoded = orjson.dumps(obj, default=_undefined_default, option=_ORJSON_OPTS)
+    if level:
+        # Raw newlines only occur as indentation (they are escaped inside strings)
+        encoded = encoded.replace(b"\n", b"\n" + b"  " * level)
+    write(encoded)
+
+
+def _zstd_compressor() -> zstandard.ZstdCompressor:
+    """Return this thread's reusable zstd compressor"""
+    cctx = getattr(_local, "cctx", None)
+    if cctx is None:
+        cctx = _local.cctx = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+    return cctx
+
+
+def _zstd_decompressor() -> zstandard.ZstdDecompressor:
+    """Return this thread's reusable zstd decompressor"""
+    dctx = getattr(_local, "dctx", None)
+    if dctx is None:
+        dctx = _local.dctx = zstandard.ZstdDecompressor()
+    return dctx
+
+
+def _snapshot_path(snapshot_id: str) -> Optional[Path]:
+    """Return the existing file of a snapshot (compressed or legacy), or None"""
+    for suffix in (_SNAPSHOT_SUFFIX, _LEGACY_SNAPSHOT_SUFFIX):
+        filepath = SNAPSHOTS_DIR / f"{snapshot_id}{suffix}"
+        if filepath.exists():
+            return filepath
+    return None
+
+
+def _write_snapshot_file(snapshot_id: str, snapshot: Dict[str, Any]):
+    """
+    Atomically write a snapshot as zstd-compressed JSON.
+
+    The JSON is written and fsynced to a temporary file, which then replaces
+    the target, so readers never see a partially written snapshot and a
+    crash leaves either the old or the new file in place. A legacy
+    uncompressed copy of the snapshot is removed afterwards.
+    """
+    filepath = SNAPSHOTS_DIR / f"{snapshot_id}{_SNAPSHOT_SUFFIX}"
+    tmp_path = SNAPSHOTS_DIR / f"{snapshot_id}{_SNAPSHOT_SUFFIX}.tmp"
+    with open(tmp_path, 'wb') as f:
+        with _zstd_compressor().stream_writer(f, closefd=False) as writer:
+            scratch = _ScratchWriter(writer.write)
+            try:
+                _write_json_stream(scratch.write, snapshot, 0, _STREAM_DEPTH)
+            finally:
+                scratch.close()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+    (SNAPSHOTS_DIR / f"{snapshot_id}{_LEGACY_SNAPSHOT_SUFFIX}").unlink(missing_ok=True)
+
+
+def _read_snapshot_file(filepath: Path) -> Dict[str, Any]:
+    """Parse a snapshot file (compressed or legacy uncompressed JSON)"""
+    with open(filepath, 'rb') as f:
+        if filepath.name.endswith(_SNAPSHOT_SUFFIX):
+            with _zstd_decompressor().stream_reader(f, closefd=False) as reader:
+                return orjson.loads(reader.read())
+
+        # Small files: a plain read is cheaper than setting up a mapping
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            return orjson.loads(f.read())
+
+        # Large files: parse from the page cache without copying into a bytes buffer
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _record_snapshot_id(snapshot_id: str):
+    """Append a saved snapshot ID to the index (building it if missing)"""
+    index_path = SNAPSHOTS_DIR / _SNAPSHOT_INDEX_NAME
+    if not index_path.exists():
+        # The rebuild picks up the snapshot that was just written
+        _rebuild_snapshot_index()
+        return
+
+    with open(index_path, 'ab') as f:
+        f.write(f"{snapshot_id}\n".encode('utf-8'))
+
+
+def _scan_snapshot_files(
+    response_files: Optional[List[os.DirEntry]] = None
+) -> List[Tuple[str, os.DirEntry]]:
+    """
+    Return (snapshot_id, DirEntry) for every snapshot file on disk.
+
+    Uses a single os.scandir pass; DirEntry caches file type and, on many
+    filesystems, stat results from the directory read. Response sidecar
+    files are skipped, or collected into response_files if given.
+    """
+    snapshot_files = []
+    with os.scandir(SNAPSHOTS_DIR) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.endswith(_RESPONSE_SUFFIX):
+                if response_files is not None:
+                    response_files.append(entry)
+            elif name.endswith(_SNAPSHOT_SUFFIX):
+                snapshot_files.append((name[:-len(_SNAPSHOT_SUFFIX)], entry))
+            elif name.endswith(_LEGACY_SNAPSHOT_SUFFIX):
+                snapshot_files.append((name[:-len(_LEGACY_SNAPSHOT_SUFFIX)], entry))
+    return snapshot_files
+
+
+def _rebuild_snapshot_index() -> List[str]:
+    """Recreate the snapshot index from the snapshot files on disk"""
+    snapshot_ids = [snapshot_id for snapshot_id, _ in _scan_snapshot_files()]
+    index_path = SNAPSHOTS_DIR / _SNAPSHOT_INDEX_NAME
+    tmp_path = index_path.with_suffix(".txt.tmp")
+    tmp_path.write_text("".join(f"{i}\n" for i in snapshot_ids), encoding='utf-8')
+    os.replace(tmp_path, index_path)
+    _touch_snapshot_index()
+    return snapshot_ids
+
+
+def _touch_snapshot_index():
+    """
+    Mark the index as current with the directory.
+
+    Our own writes (the index swap, response sidecars) change the directory
+    mtime; touching the index afterwards keeps them from looking like
+    out-of-band changes to _sorted_snapshot_ids.
+    """
+    try:
+        os.utime(SNAPSHOTS_DIR / _SNAPSHOT_INDEX_NAME)
+    except FileNotFoundError:
+        pass
+
+
+def _read_snapshot_index() -> List[str]:
+    """Return all indexed snapshot IDs, rebuilding the index if it is missing"""
+    try:
+        return (SNAPSHOTS_DIR / _SNAPSHOT_INDEX_NAME).read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return _rebuild_snapshot_index()
+
+
+def _sorted_snapshot_ids() -> List[str]:
+    """
+    Return the unique indexed snapshot IDs in ascending (chronological) order.
+
+    The sorted list is cached per process and only rebuilt when the index
+    file changes (path, mtime or size). Snapshot files copied in, restored
+    or deleted by hand change the directory but not the index, so the index
+    is rebuilt from disk when the directory is newer than it.
+    """
+    global _index_cache
+
+    index_path = SNAPSHOTS_DIR / _SNAPSHOT_INDEX_NAME
+    try:
+        st = index_path.stat()
+    except FileNotFoundError:
+        _rebuild_snapshot_index()
+        st = index_path.stat()
+    else:
+        if SNAPSHOTS_DIR.stat().st_mtime_ns > st.st_mtime_ns:
+            _rebuild_snapshot_index()
+            st = index_path.stat()
+
+    key = (index_path, st.st_mtime_ns, st.st_size)
+    cached = _index_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    # IDs may be appended out of order (explicit timestamps) or more than once
+    snapshot_ids = sorted(set(_read_snapshot_index()))
+    _index_cache = (key, snapshot_ids)
+    return snapshot_ids
+
 
 def clean_undefined_objects(obj: Any) -> Any:
     """
-    Recursively clean Jinja2 Undefined objects from data structures.
+    Replace Jinja2 Undefined objects in nested dicts/lists with "<undefined>".
+
+    save_snapshot relies on the serializer's default hook instead; this is
+    kept for update_snapshot_response, which writes the response on its own.
 
-    This prevents JSON serialization errors when template variables are undefined.
+    Containers are walked iteratively and cleaned in place (no copy).
 
     Args:
         obj: Object to clean (dict, list, or primitive)
 
     Returns:
-        Cleaned object with Undefined replaced by "<undefined>"
+        obj itself, or "<undefined>" if obj is Undefined
     """
-    # Check for Undefined types (both base Undefined and StrictUndefined)
-    try:
-        if isinstance(obj, (Undefined, StrictUndefined)):
-            return "<undefined>"
-    except:
-        # If isinstance check itself fails, likely an Undefined object
+    # StrictUndefined subclasses Undefined
+    if isinstance(obj, Undefined):
         return "<undefined>"
 
-    if isinstance(obj, dict):
-        return {k: clean_undefined_objects(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_undefined_objects(item) for item in obj]
-    else:
-        return obj
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if type(current) is dict or isinstance(current, dict):
+            items = current.items()
+        elif type(current) is list or isinstance(current, list):
+            items = enumerate(current)
+        else:
+            continue
+
+        for key, value in items:
+            if isinstance(value, Undefined):
+                current[key] = "<undefined>"
+            elif type(value) in (dict, list) or isinstance(value, (dict, list)):
+                stack.append(value)
+
+    return obj
 
 
 def save_snapshot(
@@ -62,20 +369,20 @@ def save_snapshot(
         timestamp: Override timestamp (ISO format, defaults to now)
 
     Returns:
-        snapshot_id: Unique snapshot identifier (filename without extension)
+        snapshot_id: Unique snapshot identifier (filename without ".json.zst")
     """
     # Ensure snapshots directory exists
     SNAPSHOTS_DIR.mkdir(parents=True, exist_ok=True)
 
     # Generate timestamp and snapshot ID
-    if timestamp is None:
-        timestamp = datetime.now().isoformat()
-
     # Format: YYYYMMDDTHHMMSS_instance_id
-    timestamp_short = timestamp.replace(":", "").replace("-", "").split(".")[0]
+    if timestamp is None:
+        now = datetime.now()
+        timestamp = now.isoformat()
+        timestamp_short = now.strftime(_SNAPSHOT_ID_TIME_FORMAT)
+    else:
+        timestamp_short = timestamp.partition(".")[0].translate(_SNAPSHOT_ID_STRIP)
     snapshot_id = f"{timestamp_short}_{instance_id}"
-    filename = f"{snapshot_id}.json"
-    filepath = SNAPSHOTS_DIR / filename
 
     # Construct snapshot object
     snapshot = {
@@ -88,12 +395,12 @@ def save_snapshot(
         "agent_response": agent_response
     }
 
-    # Clean any Undefined objects before JSON serialization
-    snapshot = clean_undefined_objects(snapshot)
+    # Write snapshot to file; Undefined objects are replaced during serialization
+    _write_snapshot_file(snapshot_id, snapshot)
+    _record_snapshot_id(snapshot_id)
 
-    # Write snapshot to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    # A re-saved snapshot must not pick up the response of an earlier save
+    (SNAPSHOTS_DIR / f"{snapshot_id}{_RESPONSE_SUFFIX}").unlink(missing_ok=True)
 
     return snapshot_id
 
@@ -106,28 +413,26 @@ def update_snapshot_response(
     Update an existing snapshot with agent response.
 
     This is called after LLM execution completes to append the response
-    to the snapshot that was saved before execution.
+    to the snapshot that was saved before execution. The response is
+    written to a sidecar file (merged by load_snapshot), so the snapshot
+    itself is neither read nor rewritten.
 
     Args:
         snapshot_id: Snapshot identifier
         agent_response: LLM response to append
     """
-    filename = f"{snapshot_id}.json"
-    filepath = SNAPSHOTS_DIR / filename
-
-    if not filepath.exists():
+    if _snapshot_path(snapshot_id) is None:
         raise FileNotFoundError(f"Snapshot not found: {snapshot_id}")
 
-    # Load existing snapshot
-    with open(filepath, 'r', encoding='utf-8') as f:
-        snapshot = json.load(f)
-
-    # Update with response (clean undefined objects)
-    snapshot["agent_response"] = clean_undefined_objects(agent_response)
-
-    # Write back
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    # Write response sidecar atomically (clean undefined objects)
+    response_path = SNAPSHOTS_DIR / f"{snapshot_id}{_RESPONSE_SUFFIX}"
+    tmp_path = SNAPSHOTS_DIR / f"{snapshot_id}{_RESPONSE_SUFFIX}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(clean_undefined_objects(agent_response), option=_ORJSON_OPTS))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, response_path)
+    _touch_snapshot_index()
 
 
 def load_snapshot(snapshot_id: str) -> Dict[str, Any]:
@@ -143,14 +448,22 @@ def load_snapshot(snapshot_id: str) -> Dict[str, Any]:
     Raises:
         FileNotFoundError: If snapshot doesn't exist
     """
-    filename = f"{snapshot_id}.json"
-    filepath = SNAPSHOTS_DIR / filename
+    filepath = _snapshot_path(snapshot_id)
 
-    if not filepath.exists():
+    if filepath is None:
         raise FileNotFoundError(f"Snapshot not found: {snapshot_id}")
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    snapshot = _read_snapshot_file(filepath)
+
+    # Merge the agent_response written by update_snapshot_response
+    try:
+        response = (SNAPSHOTS_DIR / f"{snapshot_id}{_RESPONSE_SUFFIX}").read_bytes()
+    except FileNotFoundError:
+        pass
+    else:
+        snapshot["agent_response"] = orjson.loads(response)
+
+    return snapshot
 
 
 def list_snapshots(
@@ -175,34 +488,40 @@ def list_snapshots(
     if not SNAPSHOTS_DIR.exists():
         return []
 
-    # Get all snapshot files
-    snapshot_files = sorted(
-        SNAPSHOTS_DIR.glob("*.json"),
-        key=lambda p: p.stem,
-        reverse=True  # Most recent first
-    )
+    # IDs start with the timestamp, so they sort chronologically
+    indexed_ids = _sorted_snapshot_ids()
+
+    start_prefix = start_date.replace("-", "") if start_date else None
+    end_prefix = end_date.replace("-", "") if end_date else None
+
+    # Narrow to the date window by binary search; the checks below still
+    # apply the exact filters within it
+    lo = bisect_left(indexed_ids, start_prefix) if start_prefix else 0
+    hi = bisect_right(indexed_ids, end_prefix + "\U0010ffff") if end_prefix else len(indexed_ids)
 
     snapshot_ids = []
-    for filepath in snapshot_files:
-        snapshot_id = filepath.stem
+    for position in range(hi - 1, lo - 1, -1):  # Most recent first
+        snapshot_id = indexed_ids[position]
 
-        # Extract timestamp and instance from filename
+        # Extract timestamp and instance from the ID
         # Format: YYYYMMDDTHHMMSS_instance_id
-        parts = snapshot_id.split("_", 1)
-        if len(parts) != 2:
+        timestamp_part, separator, file_instance_id = snapshot_id.partition("_")
+        if not separator:
             continue
 
-        timestamp_part, file_instance_id = parts
-
         # Filter by instance_id
         if instance_id and file_instance_id != instance_id:
             continue
 
         # Filter by date range
-        if start_date and timestamp_part[:8] < start_date.replace("-", ""):
+        if start_prefix and timestamp_part[:8] < start_prefix:
             continue
 
-        if end_date and timestamp_part[:8] > end_date.replace("-", ""):
+        if end_prefix and timestamp_part[:8] > end_prefix:
+            continue
+
+        # Skip snapshots whose file has since been removed
+        if _snapshot_path(snapshot_id) is None:
             continue
 
         snapshot_ids.append(snapshot_id)
@@ -227,24 +546,28 @@ def get_snapshot_stats() -> Dict[str, Any]:
             "instances": []
         }
 
-    snapshot_files = list(SNAPSHOTS_DIR.glob("*.json"))
+    # Compressed and legacy uncompressed snapshots, plus response sidecars
+    response_files: List[os.DirEntry] = []
+    snapshot_files = _scan_snapshot_files(response_files)
 
     # Calculate total size
-    total_size = sum(f.stat().st_size for f in snapshot_files)
+    total_size = (
+        sum(entry.stat().st_size for _, entry in snapshot_files)
+        + sum(entry.stat().st_size for entry in response_files)
+    )
 
-    # Count by instance
-    instance_counts = {}
-    for filepath in snapshot_files:
-        parts = filepath.stem.split("_", 1)
-        if len(parts) == 2:
-            instance_id = parts[1]
-            instance_counts[instance_id] = instance_counts.get(instance_id, 0) + 1
+    # Count by instance (IDs are YYYYMMDDTHHMMSS_instance_id)
+    instance_counts = Counter(
+        parts[2]
+        for parts in (snapshot_id.partition("_") for snapshot_id, _ in snapshot_files)
+        if parts[1]
+    )
 
     return {
         "total_snapshots": len(snapshot_files),
         "total_size_bytes": total_size,
         "instances": [
             {"instance_id": k, "count": v}
-            for k, v in sorted(instance_counts.items(), key=lambda x: x[1], reverse=True)
+            for k, v in instance_counts.most_common()
         ]
     }
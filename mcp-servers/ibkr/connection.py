@@ -16,7 +16,9 @@ Configuration:
 """
 
 import asyncio
+import copy
 import logging
+import threading
 from typing import Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -27,6 +29,13 @@ from ib_insync import util
 from ib_insync.util import logToConsole
 
 
+# Informational "error" codes (data farm connection status), logged at DEBUG
+# 2104: Market data farm connection is OK
+# 2106: HMDS data farm connection is OK
+# 2158: Sec-def data farm connection is OK
+_INFO_CODES = frozenset((2104, 2106, 2158))
+
+
 class ConnectionMode(Enum):
     """IBKR connection mode."""
     PAPER_TWS = ("localhost", 7497, "Paper Trading (TWS)")
@@ -45,7 +54,7 @@ class IBKRConnectionManager:
     Singleton connection manager for IBKR TWS/Gateway.
 
     Usage:
-        >>> manager = IBKRConnectionManager()
+        >>> manager = IBKRConnectionManager.instance()
         >>> await manager.connect(mode=ConnectionMode.PAPER_TWS)
         >>> account_summary = await manager.get_account_summary()
         >>> await manager.disconnect()
@@ -58,16 +67,51 @@ class IBKRConnectionManager:
     """
 
     _instance: Optional['IBKRConnectionManager'] = None
+    _lock = threading.Lock()
+
+    # Max qualified contracts kept by qualify_contract
+    QUALIFIED_CACHE_SIZE = 1024
 
     def __new__(cls):
         """Singleton pattern - only one connection manager instance."""
+        # Double-checked locking: the lock is only taken until the instance exists
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
 
+    @classmethod
+    def instance(cls) -> 'IBKRConnectionManager':
+        """
+        Get the global IBKR connection manager instance.
+
+        Returns the existing instance without locking; creation is
+        serialized by __new__/__init__.
+
+        Returns:
+            IBKRConnectionManager singleton instance
+        """
+        instance = cls._instance
+        if instance is None:
+            instance = cls()
+        return instance
+
+    @classmethod
+    def reset(cls) -> None:
+        """Drop the singleton so the next instance() call creates a new one (tests)."""
+        with cls._lock:
+            cls._instance = None
+
     def __init__(self):
         """Initialize connection manager (called only once)."""
-        if not hasattr(self, '_initialized'):
+        if hasattr(self, '_initialized'):
+            return
+
+        with self._lock:
+            if hasattr(self, '_initialized'):
+                return
+
             self.ib: Optional[IB] = None  # Delay IB creation until first connect
             self.mode: Optional[ConnectionMode] = None
             self.client_id: int = 1
@@ -76,6 +120,10 @@ class IBKRConnectionManager:
             self.reconnect_attempts: int = 0
             self.max_reconnect_attempts: int = 5
 
+            # Qualified contracts by _contract_key, so repeat orders on the
+            # same contract skip the qualification round-trip
+            self._qualified_contracts: Dict[tuple, Contract] = {}
+
             # Set up logging
             self.logger = logging.getLogger(__name__)
 
@@ -127,13 +175,15 @@ class IBKRConnectionManager:
         self.mode = mode
         self.client_id = client_id
 
-        self.logger.info(f"Connecting to IBKR: {mode.description} ({mode.host}:{mode.port})")
+        host, port, description = mode.host, mode.port, mode.description
+
+        self.logger.info("Connecting to IBKR: %s (%s:%s)", description, host, port)
 
         try:
             # Use synchronous connect method
             self.ib.connect(
-                host=mode.host,
-                port=mode.port,
+                host=host,
+                port=port,
                 clientId=client_id,
                 timeout=timeout,
                 readonly=readonly
@@ -143,13 +193,13 @@ class IBKRConnectionManager:
             self.last_connection_time = datetime.now()
             self.reconnect_attempts = 0
 
-            self.logger.info(f"Successfully connected to IBKR (Client ID: {client_id})")
+            self.logger.info("Successfully connected to IBKR (Client ID: %s)", client_id)
             return True
 
         except Exception as e:
-            self.logger.error(f"Failed to connect to IBKR: {e}")
+            self.logger.error("Failed to connect to IBKR: %s", e)
             self.is_connected = False
-            raise ConnectionError(f"Could not connect to IBKR {mode.description}: {e}")
+            raise ConnectionError(f"Could not connect to IBKR {description}: {e}")
 
     async def connect(
         self,
@@ -177,12 +227,14 @@ class IBKRConnectionManager:
         self.mode = mode
         self.client_id = client_id
 
-        self.logger.info(f"Connecting to IBKR: {mode.description} ({mode.host}:{mode.port})")
+        host, port, description = mode.host, mode.port, mode.description
+
+        self.logger.info("Connecting to IBKR: %s (%s:%s)", description, host, port)
 
         try:
             await self.ib.connectAsync(
-                host=mode.host,
-                port=mode.port,
+                host=host,
+                port=port,
                 clientId=client_id,
                 timeout=timeout,
                 readonly=readonly
@@ -192,13 +244,13 @@ class IBKRConnectionManager:
             self.last_connection_time = datetime.now()
             self.reconnect_attempts = 0
 
-            self.logger.info(f"Successfully connected to IBKR (Client ID: {client_id})")
+            self.logger.info("Successfully connected to IBKR (Client ID: %s)", client_id)
             return True
 
         except Exception as e:
-            self.logger.error(f"Failed to connect to IBKR: {e}")
+            self.logger.error("Failed to connect to IBKR: %s", e)
             self.is_connected = False
-            raise ConnectionError(f"Could not connect to IBKR {mode.description}: {e}")
+            raise ConnectionError(f"Could not connect to IBKR {description}: {e}")
 
     async def disconnect(self) -> None:
         """Disconnect from IBKR."""
@@ -284,27 +336,29 @@ class IBKRConnectionManager:
 
     def _on_connected(self):
         """Called when connection is established."""
-        self.logger.info(f"✅ Connected to IBKR {self.mode.description if self.mode else ''}")
+        mode = self.mode
+        self.logger.info("✅ Connected to IBKR %s", mode.description if mode else '')
         self.is_connected = True
         self.reconnect_attempts = 0
 
     def _on_disconnected(self):
         """Called when connection is lost."""
-        self.logger.warning(f"⚠️  Disconnected from IBKR {self.mode.description if self.mode else ''}")
+        mode = self.mode
+        self.logger.warning("⚠️  Disconnected from IBKR %s", mode.description if mode else '')
         self.is_connected = False
 
     def _on_error(self, reqId: int, errorCode: int, errorString: str, contract: Contract):
         """Called on IBKR API errors."""
-        # Error code 2104 is "Market data farm connection is OK" - not an error
-        # Error code 2106 is "HMDS data farm connection is OK" - not an error
-        if errorCode in [2104, 2106, 2158]:
-            self.logger.debug(f"IBKR Info [{errorCode}]: {errorString}")
+        # Logging args are passed lazily: messages are only formatted when
+        # the level is enabled (info codes arrive hundreds of times a minute)
+        if errorCode in _INFO_CODES:
+            self.logger.debug("IBKR Info [%d]: %s", errorCode, errorString)
         elif errorCode >= 2000:
             # Warnings (2000+)
-            self.logger.warning(f"IBKR Warning [{errorCode}]: {errorString}")
+            self.logger.warning("IBKR Warning [%d]: %s", errorCode, errorString)
         else:
             # Errors (< 2000)
-            self.logger.error(f"IBKR Error [{errorCode}]: {errorString} (ReqId: {reqId})")
+            self.logger.error("IBKR Error [%d]: %s (ReqId: %s)", errorCode, errorString, reqId)
 
     # ==========================================
     # Account Operations
@@ -404,26 +458,51 @@ class IBKRConnectionManager:
         """
         await self.ensure_connected()
 
-        # Qualify the contract (get full contract details from IBKR)
-        # Use synchronous method - ib_insync handles async internally
-        qualified = self.ib.qualifyContracts(contract)
-        await asyncio.sleep(0)  # Yield to event loop to let qualification complete
+        contract = await self.qualify_contract(contract)
 
-        if not qualified:
-            raise ValueError(f"Could not qualify contract: {contract}")
+        # Place the order (sent immediately; status updates arrive on trade.statusEvent)
+        trade = self.ib.placeOrder(contract, order)
 
-        contract = qualified[0]
+        self.logger.info("Order placed: %s %s %s %s", trade.order.orderType,
+                         trade.order.action, trade.order.totalQuantity, contract.symbol)
 
-        # Place the order
-        trade = self.ib.placeOrder(contract, order)
+        return trade
 
-        # Wait for order to be submitted
-        await asyncio.sleep(0)  # Yield to event loop
+    @staticmethod
+    def _contract_key(contract: Contract) -> tuple:
+        """Fields that identify a contract for qualification purposes."""
+        return (
+            contract.secType, contract.symbol, contract.lastTradeDateOrContractMonth,
+            contract.strike, contract.right, contract.multiplier,
+            contract.exchange, contract.currency, contract.conId
+        )
 
-        self.logger.info(f"Order placed: {trade.order.orderType} {trade.order.action} "
-                        f"{trade.order.totalQuantity} {contract.symbol}")
+    async def qualify_contract(self, contract: Contract) -> Contract:
+        """
+        Return the qualified version of contract, asking IBKR only on a cache miss.
 
-        return trade
+        Each call returns a fresh copy of the cached contract, so a caller
+        mutating it can't alter the contract used by other orders.
+
+        Raises:
+            ValueError: If IBKR cannot qualify the contract
+        """
+        key = self._contract_key(contract)
+        cached = self._qualified_contracts.get(key)
+        if cached is not None:
+            return copy.copy(cached)
+
+        # Get full contract details from IBKR; returns once IBKR has answered
+        qualified = await self.ib.qualifyContractsAsync(contract)
+
+        if not qualified:
+            raise ValueError(f"Could not qualify contract: {contract}")
+
+        if len(self._qualified_contracts) >= self.QUALIFIED_CACHE_SIZE:
+            # Evict the oldest entry (dicts keep insertion order)
+            del self._qualified_contracts[next(iter(self._qualified_contracts))]
+        self._qualified_contracts[key] = qualified[0]
+        return copy.copy(qualified[0])
 
     async def cancel_order(self, order: Order) -> None:
         """
@@ -434,8 +513,7 @@ class IBKRConnectionManager:
         """
         await self.ensure_connected()
         self.ib.cancelOrder(order)
-        await asyncio.sleep(0)  # Yield to event loop
-        self.logger.info(f"Order cancelled: {order.orderId}")
+        self.logger.info("Order cancelled: %s", order.orderId)
 
     async def get_open_trades(self) -> list[Trade]:
         """
@@ -461,50 +539,52 @@ class IBKRConnectionManager:
         Returns:
             Current price or None if not available
         """
-        await self.ensure_connected()
-
-        # Qualify contract
-        qualified = self.ib.qualifyContracts(contract)
-        await asyncio.sleep(0)  # Yield to event loop to let qualification complete
-        if not qualified:
-            return None
-
-        contract = qualified[0]
+        prices = await self.get_current_prices([contract])
+        return prices[0]
 
-        # Request market data
-        ticker = self.ib.reqMktData(contract)
-        await asyncio.sleep(0)  # Yield to event loop
+    async def get_current_prices(self, contracts: list[Contract]) -> list[Optional[float]]:
+        """
+        Get current market prices for several contracts in one batch.
 
-        # Get last price (or mid price if last not available)
-        if ticker.last and ticker.last > 0:
-            price = ticker.last
-        elif ticker.bid and ticker.ask:
-            price = (ticker.bid + ticker.ask) / 2
-        else:
-            price = None
+        All contracts are qualified with a single request and one snapshot
+        is requested for all of them, so N contracts cost one round-trip
+        batch instead of N serial ones. Both calls return once IBKR has
+        answered; there is no subscription to cancel.
 
-        # Cancel market data subscription
-        self.ib.cancelMktData(contract)
+        Args:
+            contracts: IBKR Contract objects
 
-        return price
+        Returns:
+            Prices in the same order as contracts (None if not available)
+        """
+        await self.ensure_connected()
 
+        prices: list[Optional[float]] = [None] * len(contracts)
+        if not contracts:
+            return prices
 
-# ==========================================
-# Global Singleton Instance
-# ==========================================
+        # Qualify all contracts in one batch
+        qualified = await self.ib.qualifyContractsAsync(*contracts)
+        if len(qualified) == len(contracts):
+            positions = list(enumerate(qualified))
+        else:
+            # Contracts are qualified in place; unqualified ones are dropped
+            qualified_ids = {id(c) for c in qualified}
+            positions = [(i, c) for i, c in enumerate(contracts) if id(c) in qualified_ids]
 
-# Global connection manager instance (singleton)
-_manager: Optional[IBKRConnectionManager] = None
+        # One-shot market data snapshot for all contracts
+        tickers = await self.ib.reqTickersAsync(*(c for _, c in positions))
 
+        for (i, _), ticker in zip(positions, tickers):
+            prices[i] = self._ticker_price(ticker)
 
-def get_connection_manager() -> IBKRConnectionManager:
-    """
-    Get the global IBKR connection manager instance.
+        return prices
 
-    Returns:
-        IBKRConnectionManager singleton instance
-    """
-    global _manager
-    if _manager is None:
-        _manager = IBKRConnectionManager()
-    return _manager
+    @staticmethod
+    def _ticker_price(ticker) -> Optional[float]:
+        """Last price, or bid/ask midpoint if last is not available."""
+        if ticker.last and ticker.last > 0:
+            return ticker.last
+        if ticker.bid and ticker.ask:
+            return (ticker.bid + ticker.ask) / 2
+        return None
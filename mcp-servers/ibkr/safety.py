@@ -5,13 +5,55 @@ Implements hard-coded limits and circuit breakers to prevent catastrophic tradin
 All trading operations MUST pass through these safety checks.
 """
 
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
-import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Protocol, TextIO, Tuple
+import atexit
+import copy
+import os
+import threading
 from pathlib import Path
 
+import orjson
+
+
+# Workspace paths, resolved once at import
+_WORKSPACE = Path.home() / "trading_workspace"
+_MEMORY_PATH = _WORKSPACE / "state" / "agent_memory.json"
+_CB_LOG = _WORKSPACE / "logs" / "circuit_breaker.log"
+_VIOL_LOG = _WORKSPACE / "logs" / "safety_violations.log"
+# Created once here; the write paths below assume these directories exist
+_MEMORY_PATH.parent.mkdir(parents=True, exist_ok=True)
+_CB_LOG.parent.mkdir(parents=True, exist_ok=True)
+
+# Persistent append handles for the safety logs, opened on first use.
+# Entries are audit records, so every write is flushed before returning.
+_log_files: Dict[Path, TextIO] = {}
+_log_lock = threading.Lock()
+
+
+def _log_file(path: Path):
+    """Return the shared append handle for a log file (caller holds _log_lock)."""
+    f = _log_files.get(path)
+    if f is None:
+        f = open(path, 'a', buffering=8192)
+        _log_files[path] = f
+    return f
+
+
+def _close_log_files():
+    """Flush and close all safety log handles."""
+    with _log_lock:
+        for f in _log_files.values():
+            f.close()
+        _log_files.clear()
+
+
+atexit.register(_close_log_files)
+
 
 class ViolationType(Enum):
     """Types of safety violations."""
@@ -23,7 +65,7 @@ class ViolationType(Enum):
     EMERGENCY_STOP = "emergency_stop"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SafetyLimits:
     """Hard-coded safety limits. DO NOT modify without human approval."""
 
@@ -48,21 +90,236 @@ class SafetyLimits:
     MAX_SPREAD_WIDTH: float = 10.0  # Maximum spread width for single leg ($)
 
 
+# Shared default limits; SafetyLimits is frozen, so one instance serves every validator
+_DEFAULT_LIMITS = SafetyLimits()
+
+
+@lru_cache(maxsize=8)
+def _load_memory_cached(
+    path_str: str, ino: int, mtime_ns: int, ctime_ns: int, size: int
+) -> Dict:
+    """
+    Parse agent memory JSON, cached by file identity.
+
+    ino, mtime_ns, ctime_ns and size are part of the cache key only, so a
+    rewritten file misses the cache and is parsed again. The inode catches
+    same-size atomic replaces landing within one mtime tick.
+    """
+    with open(path_str, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def _read_agent_memory(memory_path: Path) -> Optional[Dict]:
+    """Return parsed agent memory (shared, do not mutate), or None if missing."""
+    try:
+        st = os.stat(memory_path)
+    except FileNotFoundError:
+        return None
+    return _load_memory_cached(
+        str(memory_path), st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size
+    )
+
+
+# Serializes read-modify-write updates of agent memory within the process
+_memory_write_lock = threading.Lock()
+
+
+def _write_agent_memory(memory_path: Path, memory: Dict):
+    """
+    Atomically replace the agent memory file (machine-read, so compact).
+
+    Written to a temp file and swapped in so readers never see a truncated
+    file.
+    """
+    tmp_path = memory_path.with_name(memory_path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(memory))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, memory_path)
+
+
+def update_agent_memory(
+    mutate: Callable[[Dict], Any],
+    memory_path: Optional[Path] = None
+) -> Any:
+    """
+    Apply mutate to agent memory and persist the result.
+
+    The current memory comes from the shared parsed copy (not re-parsed
+    unless the file changed) and is deep-copied before mutate sees it.
+    The whole read-modify-write holds one lock, so concurrent updates in
+    this process can't drop each other's changes. Writes go straight to
+    disk: positions and the circuit breaker back the safety checks, so
+    they are never held in a delayed-flush buffer.
+
+    Args:
+        mutate: Called with the memory dict to modify in place. Its return
+            value is returned; None means nothing changed and skips the write.
+        memory_path: Memory file (defaults to the workspace agent_memory.json)
+
+    Returns:
+        Whatever mutate returned
+
+    Raises:
+        FileNotFoundError: If the memory file doesn't exist
+    """
+    memory_path = memory_path or _MEMORY_PATH
+    with _memory_write_lock:
+        memory = _read_agent_memory(memory_path)
+        if memory is None:
+            raise FileNotFoundError(f"Agent memory not found: {memory_path}")
+        memory = copy.deepcopy(memory)
+
+        result = mutate(memory)
+        if result is not None:
+            _write_agent_memory(memory_path, memory)
+        return result
+
+
+# (parsed memory dict, its symbol -> exposure index), shared by every
+# validator in the process so the index is built once per memory change
+_exposure_cache: Tuple[Optional[Dict], Dict[str, float]] = (None, {})
+
+
+def _build_exposure_index(memory: Dict) -> Dict[str, float]:
+    """Sum capital_at_risk per symbol over the open trades in memory."""
+    exposure = defaultdict(float)
+    for trade in memory.get("positions", {}).get("open_trades", []):
+        exposure[trade.get("symbol")] += trade.get("capital_at_risk", 0)
+    return dict(exposure)
+
+
+def _exposure_index(memory: Dict) -> Dict[str, float]:
+    """Return the per-symbol capital_at_risk index for a parsed memory dict."""
+    global _exposure_cache
+
+    source, index = _exposure_cache
+    if source is not memory:
+        index = _build_exposure_index(memory)
+        _exposure_cache = (memory, index)
+    return index
+
+
+class MemoryBackend(Protocol):
+    """
+    Where SafetyValidator reads and persists agent memory.
+
+    shared_snapshots is True when read() returns shared, never-mutated
+    snapshots (a new object after every change). The validator can then
+    skip rebuilding its state when read() returns the same object again.
+    """
+
+    shared_snapshots: bool
+
+    def read(self) -> Optional[Dict]:
+        """Return the agent memory dict, or None if there is none yet."""
+        ...
+
+    def write(self, memory: Dict) -> None:
+        """Persist the full agent memory dict."""
+        ...
+
+    def update(self, mutate: Callable[[Dict], Any]) -> Any:
+        """
+        Apply mutate to the current agent memory and persist it atomically.
+
+        Returns whatever mutate returned. Raises FileNotFoundError if there
+        is no agent memory yet.
+        """
+        ...
+
+
+class FileBackend:
+    """Agent memory in a JSON file (the default: ~/trading_workspace/state/agent_memory.json)."""
+
+    shared_snapshots = True
+
+    def __init__(self, memory_path: Path = _MEMORY_PATH):
+        self.memory_path = memory_path
+
+    def read(self) -> Optional[Dict]:
+        # Stat on every read so validation never sees state older than the file
+        return _read_agent_memory(self.memory_path)
+
+    def write(self, memory: Dict) -> None:
+        with _memory_write_lock:
+            _write_agent_memory(self.memory_path, memory)
+
+    def update(self, mutate: Callable[[Dict], Any]) -> Any:
+        return update_agent_memory(mutate, self.memory_path)
+
+
+class DictBackend:
+    """
+    Agent memory held in a plain dict, with no disk I/O (tests, simulations).
+
+    Mutate data in place, then call reload_agent_state() on the validator.
+    """
+
+    shared_snapshots = False
+
+    def __init__(self, data: Optional[Dict] = None):
+        self.data = data
+
+    def read(self) -> Optional[Dict]:
+        return self.data
+
+    def write(self, memory: Dict) -> None:
+        self.data = memory
+
+    def update(self, mutate: Callable[[Dict], Any]) -> Any:
+        if self.data is None:
+            raise FileNotFoundError("Agent memory not initialized")
+        return mutate(self.data)
+
+
 class SafetyValidator:
     """Validates all trading operations against safety limits."""
 
-    def __init__(self, limits: Optional[SafetyLimits] = None):
-        self.limits = limits or SafetyLimits()
+    def __init__(
+        self,
+        limits: Optional[SafetyLimits] = None,
+        backend: Optional[MemoryBackend] = None
+    ):
+        """
+        Args:
+            limits: Safety limits (defaults to the shared SafetyLimits())
+            backend: Where agent memory is read from and written to
+                (defaults to FileBackend on the workspace agent_memory.json)
+        """
+        self.limits = limits if limits is not None else _DEFAULT_LIMITS
+        self.backend = backend if backend is not None else FileBackend()
+        self._exposure_by_symbol: Dict[str, float] = {}
+        # Parsed memory dict the current state was derived from
+        self._memory_source: Optional[Dict] = None
         self._load_agent_state()
 
     def _load_agent_state(self):
         """Load agent memory to check current portfolio state."""
-        memory_path = Path.home() / "trading_workspace" / "state" / "agent_memory.json"
-
-        if memory_path.exists():
-            with open(memory_path, 'r') as f:
-                self.agent_memory = json.load(f)
+        memory = self.backend.read()
+        shared = self.backend.shared_snapshots
+
+        if shared and memory is not None and memory is self._memory_source:
+            # Same shared parsed snapshot as the last load (the file hasn't
+            # changed), so the derived state below is still current
+            return
+        self._memory_source = memory if shared else None
+
+        if memory is not None:
+            # Shallow copy: callers replace top-level sections rather than
+            # mutating the cached dict in place
+            self.agent_memory = copy.copy(memory)
+
+            if shared:
+                self._exposure_by_symbol = _exposure_index(memory)
+            else:
+                # Unshared dicts may be mutated in place between loads, so
+                # they can't use the identity-keyed shared index
+                self._exposure_by_symbol = _build_exposure_index(memory)
         else:
+            self._exposure_by_symbol = {}
+
             # Default state if file doesn't exist yet
             self.agent_memory = {
                 "safety_state": {
@@ -78,8 +335,25 @@ class SafetyValidator:
                 }
             }
 
+        # Flatten the fields validate_order reads so checks are attribute loads
+        memory = self.agent_memory
+        safety_state = memory.get("safety_state", {})
+        self._emergency_stop = memory.get("agent_state", {}).get("emergency_stop", False)
+        self._daily_loss = abs(safety_state.get("daily_loss", 0))
+        self._consecutive_losses = safety_state.get("consecutive_losses", 0)
+
+        # Account-level limits depend only on this state, not on the order,
+        # so the verdict is computed once per load rather than per validation
+        self._account_error = self._account_limit_error()
+
     def reload_agent_state(self):
-        """Reload agent memory from disk (call before each validation)."""
+        """
+        Refresh agent memory (call before each validation).
+
+        The file is stat-checked on every call but only re-parsed after it
+        changes on disk, and the derived state is only rebuilt when the
+        parsed snapshot changes.
+        """
         self._load_agent_state()
 
     def validate_order(self, order: Dict) -> Tuple[bool, Optional[str]]:
@@ -98,94 +372,121 @@ class SafetyValidator:
             (is_valid, error_message)
         """
         # Check emergency stop flag
-        if self.agent_memory.get("agent_state", {}).get("emergency_stop", False):
+        if self._emergency_stop:
             return False, "EMERGENCY STOP flag is set. All trading operations blocked."
 
         # Check circuit breaker - TEMPORARILY DISABLED FOR TESTING
         # if self.agent_memory.get("safety_state", {}).get("circuit_breaker_triggered", False):
         #     return False, "Circuit breaker triggered. Trading operations suspended."
 
+        return self._check_order(order, self._account_error)
+
+    def validate_orders_batch(self, orders: List[Dict]) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Validate many candidate orders against the current agent state.
+
+        Same results as calling validate_order on each order, but the
+        emergency stop is checked once for the whole batch.
+
+        Args:
+            orders: List of order dictionaries (see validate_order)
+
+        Returns:
+            List of (is_valid, error_message), one per order
+        """
+        if self._emergency_stop:
+            return [
+                (False, "EMERGENCY STOP flag is set. All trading operations blocked.")
+            ] * len(orders)
+
+        check_order = self._check_order
+        account_error = self._account_error
+        return [check_order(order, account_error) for order in orders]
+
+    def _account_limit_error(self) -> Optional[str]:
+        """Return the daily-loss / consecutive-loss error for the account, if any."""
+        limits = self.limits
+
+        # Validate daily loss limit
+        daily_loss = self._daily_loss
+        if daily_loss >= limits.DAILY_LOSS_LIMIT:
+            return (
+                f"Daily loss limit reached (${daily_loss:.2f} >= "
+                f"${limits.DAILY_LOSS_LIMIT:.2f}). No new trades allowed today."
+            )
+
+        # Validate consecutive losses
+        consecutive_losses = self._consecutive_losses
+        if consecutive_losses >= limits.CONSECUTIVE_LOSS_LIMIT:
+            return (
+                f"Consecutive loss limit reached ({consecutive_losses} >= "
+                f"{limits.CONSECUTIVE_LOSS_LIMIT}). Trading suspended."
+            )
+
+        return None
+
+    def _check_order(
+        self, order: Dict, account_error: Optional[str]
+    ) -> Tuple[bool, Optional[str]]:
+        """Run the per-order checks, reporting account_error in its usual place."""
+        limits = self.limits
+
         # Validate max trade risk
         max_risk = order.get("max_risk", 0)
-        if max_risk > self.limits.MAX_TRADE_RISK:
+        if max_risk > limits.MAX_TRADE_RISK:
             return False, (
                 f"Max risk (${max_risk:.2f}) exceeds limit "
-                f"(${self.limits.MAX_TRADE_RISK:.2f})"
+                f"(${limits.MAX_TRADE_RISK:.2f})"
             )
 
         # Validate capital requirement
         capital = order.get("capital_required", 0)
-        if capital > self.limits.MAX_TRADE_CAPITAL:
+        if capital > limits.MAX_TRADE_CAPITAL:
             return False, (
                 f"Capital required (${capital:.2f}) exceeds limit "
-                f"(${self.limits.MAX_TRADE_CAPITAL:.2f})"
+                f"(${limits.MAX_TRADE_CAPITAL:.2f})"
             )
 
-        # Validate daily loss limit
-        daily_loss = abs(self.agent_memory.get("safety_state", {}).get("daily_loss", 0))
-        if daily_loss >= self.limits.DAILY_LOSS_LIMIT:
-            return False, (
-                f"Daily loss limit reached (${daily_loss:.2f} >= "
-                f"${self.limits.DAILY_LOSS_LIMIT:.2f}). No new trades allowed today."
-            )
+        # Daily loss / consecutive loss limits
+        if account_error is not None:
+            return False, account_error
 
-        # Validate consecutive losses
-        consecutive_losses = self.agent_memory.get("safety_state", {}).get("consecutive_losses", 0)
-        if consecutive_losses >= self.limits.CONSECUTIVE_LOSS_LIMIT:
-            return False, (
-                f"Consecutive loss limit reached ({consecutive_losses} >= "
-                f"{self.limits.CONSECUTIVE_LOSS_LIMIT}). Trading suspended."
-            )
+        # Validate order legs (for options)
+        min_price = limits.MIN_OPTION_PRICE
+        max_width = limits.MAX_SPREAD_WIDTH
+        for leg in order.get("legs", []):
+            # Check minimum option price
+            price = leg.get("price", 0.0)
+            if price < min_price:
+                return False, (
+                    f"Option price (${price:.2f}) below minimum "
+                    f"(${min_price:.2f}). Avoid illiquid options."
+                )
 
-        # Validate concentration limit
+            # Validate spread width (if applicable)
+            spread_width = leg.get("spread_width")
+            if spread_width is not None and spread_width > max_width:
+                return False, (
+                    f"Spread width (${spread_width:.2f}) exceeds maximum "
+                    f"(${max_width:.2f})"
+                )
+
+        # Validate concentration limit (last: depends on portfolio state)
         symbol = order.get("symbol")
         if symbol:
             concentration = self._calculate_symbol_concentration(symbol, capital)
-            if concentration > self.limits.MAX_CONCENTRATION:
+            if concentration > limits.MAX_CONCENTRATION:
                 return False, (
                     f"Concentration limit exceeded for {symbol} "
-                    f"({concentration*100:.1f}% > {self.limits.MAX_CONCENTRATION*100:.1f}%)"
-                )
-
-        # Validate order legs (for options)
-        legs = order.get("legs", [])
-        for leg in legs:
-            is_valid, error = self._validate_leg(leg)
-            if not is_valid:
-                return False, error
-
-        return True, None
-
-    def _validate_leg(self, leg: Dict) -> Tuple[bool, Optional[str]]:
-        """Validate a single order leg."""
-        # Check minimum option price
-        price = leg.get("price", 0)
-        if price < self.limits.MIN_OPTION_PRICE:
-            return False, (
-                f"Option price (${price:.2f}) below minimum "
-                f"(${self.limits.MIN_OPTION_PRICE:.2f}). Avoid illiquid options."
-            )
-
-        # Validate spread width (if applicable)
-        if "spread_width" in leg:
-            width = leg["spread_width"]
-            if width > self.limits.MAX_SPREAD_WIDTH:
-                return False, (
-                    f"Spread width (${width:.2f}) exceeds maximum "
-                    f"(${self.limits.MAX_SPREAD_WIDTH:.2f})"
+                    f"({concentration*100:.1f}% > {limits.MAX_CONCENTRATION*100:.1f}%)"
                 )
 
         return True, None
 
     def _calculate_symbol_concentration(self, symbol: str, new_capital: float) -> float:
         """Calculate portfolio concentration for a symbol."""
-        # Get existing exposure to this symbol
-        open_trades = self.agent_memory.get("positions", {}).get("open_trades", [])
-        existing_exposure = sum(
-            trade.get("capital_at_risk", 0)
-            for trade in open_trades
-            if trade.get("symbol") == symbol
-        )
+        # Existing exposure to this symbol (indexed on memory load)
+        existing_exposure = self._exposure_by_symbol.get(symbol, 0.0)
 
         # Calculate total portfolio value (placeholder - should get from IBKR account)
         total_portfolio_value = self.limits.MAX_TOTAL_EXPOSURE  # Temporary assumption
@@ -217,33 +518,47 @@ class SafetyValidator:
 
     def _trigger_circuit_breaker(self, drawdown: float):
         """Trigger circuit breaker and update agent state."""
-        self.agent_memory["safety_state"]["circuit_breaker_triggered"] = True
-        self.agent_memory["safety_state"]["circuit_breaker_timestamp"] = datetime.now().isoformat()
-
-        # Save updated state
-        memory_path = Path.home() / "trading_workspace" / "state" / "agent_memory.json"
-        with open(memory_path, 'w') as f:
-            json.dump(self.agent_memory, f, indent=2)
+        timestamp = datetime.now().isoformat()
+
+        def trip(memory: Dict) -> Dict:
+            safety_state = memory.setdefault("safety_state", {})
+            safety_state["circuit_breaker_triggered"] = True
+            safety_state["circuit_breaker_timestamp"] = timestamp
+            return safety_state
+
+        # Change only safety_state, on the current memory rather than the
+        # copy loaded with this validator, so newer position updates survive
+        try:
+            self.backend.update(trip)
+        except FileNotFoundError:
+            # Nothing persisted yet: start from the default state
+            memory = copy.deepcopy(self.agent_memory)
+            trip(memory)
+            self.backend.write(memory)
+        self._load_agent_state()
 
         # Log circuit breaker event
-        log_path = Path.home() / "trading_workspace" / "logs" / "circuit_breaker.log"
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(log_path, 'a') as f:
-            f.write(f"\n[{datetime.now().isoformat()}] CIRCUIT BREAKER TRIGGERED\n")
-            f.write(f"Drawdown: {drawdown*100:.2f}%\n")
-            f.write(f"All trading operations suspended.\n")
+        with _log_lock:
+            f = _log_file(_CB_LOG)
+            f.write(
+                f"\n[{timestamp}] CIRCUIT BREAKER TRIGGERED\n"
+                f"Drawdown: {drawdown*100:.2f}%\n"
+                f"All trading operations suspended.\n"
+            )
+            f.flush()
 
     def log_violation(self, violation_type: ViolationType, details: str):
-        """Log a safety violation."""
-        log_path = Path.home() / "trading_workspace" / "logs" / "safety_violations.log"
-        log_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with open(log_path, 'a') as f:
+        """Log a safety violation (flushed per entry, so a crash can't lose it)."""
+        with _log_lock:
+            f = _log_file(_VIOL_LOG)
             timestamp = datetime.now().isoformat()
-            f.write(f"\n[{timestamp}] VIOLATION: {violation_type.value}\n")
-            f.write(f"Details: {details}\n")
+            f.write(
+                f"\n[{timestamp}] VIOLATION: {violation_type.value}\n"
+                f"Details: {details}\n"
+            )
+            f.flush()
 
 
 def create_safety_validator() -> SafetyValidator:
     """Factory function to create safety validator with default limits."""
-    return SafetyValidator(SafetyLimits())
+    return SafetyValidator(_DEFAULT_LIMITS)
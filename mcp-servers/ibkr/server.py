@@ -12,11 +12,18 @@ The server will listen on stdio for MCP protocol messages.
 """
 
 import asyncio
+import io
 import json
 import sys
 from typing import Any, Dict, List, Optional
 
-from tools import IBKRTools, TOOLS_METADATA
+import orjson
+
+from tools import IBKRTools, TOOLS_METADATA, INPUT_VALIDATORS
+
+
+# Max length of a single stdin message line (asyncio's default is 64 KiB)
+_STDIN_LINE_LIMIT = 16 * 1024 * 1024
 
 
 class MCPIBKRServer:
@@ -30,6 +37,29 @@ class MCPIBKRServer:
             "description": "IBKR trading operations with safety layer"
         }
 
+        # Tool name -> bound handler; names in _async_tools are awaited
+        self._dispatch = {
+            "get_account": self.tools.get_account_async,
+            "get_positions": self.tools.get_positions_async,
+            "place_order": self.tools.place_order_async,
+            "close_position": self.tools.close_position,
+            "get_order_status": self.tools.get_order_status,
+            "health_check": self.tools.health_check_async,
+        }
+        self._async_tools = frozenset(
+            ("get_account", "get_positions", "place_order", "health_check")
+        )
+        # Tool name -> argument names its inputSchema declares; anything else
+        # a client sends (request ids, "_meta", ...) is dropped before the call
+        self._tool_params = {
+            tool["name"]: frozenset(tool["inputSchema"].get("properties", {}))
+            for tool in TOOLS_METADATA
+        }
+
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._stdout_raw: Optional[io.FileIO] = None
+
     async def handle_initialize(self, params: Dict) -> Dict:
         """Handle MCP initialize request."""
         return {
@@ -50,19 +80,8 @@ class MCPIBKRServer:
         """Handle MCP tools/call request."""
         try:
             # Route to appropriate tool (with async support)
-            if name == "get_account":
-                result = await self.tools.get_account_async()
-            elif name == "get_positions":
-                result = await self.tools.get_positions_async(**arguments)
-            elif name == "place_order":
-                result = await self.tools.place_order_async(**arguments)
-            elif name == "close_position":
-                result = self.tools.close_position(**arguments)
-            elif name == "get_order_status":
-                result = self.tools.get_order_status(**arguments)
-            elif name == "health_check":
-                result = await self.tools.health_check_async()
-            else:
+            fn = self._dispatch.get(name)
+            if fn is None:
                 return {
                     "content": [{
                         "type": "text",
@@ -71,11 +90,23 @@ class MCPIBKRServer:
                     "isError": True
                 }
 
-            # Format response
+            # Keep only declared arguments, then check them against the
+            # tool's precompiled inputSchema
+            params = self._tool_params[name]
+            arguments = {key: value for key, value in arguments.items() if key in params}
+            INPUT_VALIDATORS[name](arguments)
+
+            if name in self._async_tools:
+                result = await fn(**arguments)
+            else:
+                result = fn(**arguments)
+
+            # Format response (compact: the text is escaped again inside the
+            # JSON-RPC envelope, so indentation would only add bytes)
             return {
                 "content": [{
                     "type": "text",
-                    "text": json.dumps(result, indent=2)
+                    "text": orjson.dumps(result).decode()
                 }]
             }
 
@@ -119,24 +150,72 @@ class MCPIBKRServer:
                 }
             }
 
+    async def _open_stdio(self):
+        """
+        Attach stdin/stdout to the event loop as async pipes.
+
+        Falls back to blocking stdio (reads via the default executor) when
+        a stream is not a pipe, socket or tty, e.g. redirected from a file.
+        """
+        loop = asyncio.get_running_loop()
+
+        try:
+            reader = asyncio.StreamReader(limit=_STDIN_LINE_LIMIT)
+            await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), sys.stdin
+            )
+            self._reader = reader
+        except (ValueError, OSError):
+            self._reader = None
+
+        try:
+            transport, protocol = await loop.connect_write_pipe(
+                asyncio.streams.FlowControlMixin, sys.stdout
+            )
+            self._writer = asyncio.StreamWriter(transport, protocol, None, loop)
+        except (ValueError, OSError):
+            self._writer = None
+            # Unbuffered raw handle: one write() per message, no flush needed
+            self._stdout_raw = io.FileIO(sys.stdout.fileno(), "wb", closefd=False)
+
+    async def _read_line(self) -> bytes:
+        """Read one line-delimited message from stdin (b"" on EOF)."""
+        if self._reader is not None:
+            return await self._reader.readline()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, sys.stdin.buffer.readline
+        )
+
+    async def _send(self, obj: Dict):
+        """Write one JSON-RPC message to stdout."""
+        data = orjson.dumps(obj) + b"\n"
+        if self._writer is not None:
+            self._writer.write(data)
+            await self._writer.drain()
+        else:
+            view = memoryview(data)
+            while view:
+                view = view[self._stdout_raw.write(view):]
+
     async def run(self):
         """Run the MCP server on stdio."""
         print("IBKR MCP Server starting...", file=sys.stderr)
         print(f"Server: {self.server_info['name']} v{self.server_info['version']}", file=sys.stderr)
         print("Listening on stdio for MCP messages...", file=sys.stderr)
 
+        await self._open_stdio()
+
         while True:
             try:
                 # Read message from stdin (MCP protocol uses line-delimited JSON)
-                line = await asyncio.get_event_loop().run_in_executor(
-                    None, sys.stdin.readline
-                )
+                line = await self._read_line()
 
                 if not line:
                     break
 
                 # Parse JSON-RPC message
-                message = json.loads(line.strip())
+                # (orjson.JSONDecodeError subclasses json.JSONDecodeError)
+                message = orjson.loads(line)
 
                 # Handle message
                 response = await self.handle_message(message)
@@ -148,7 +227,7 @@ class MCPIBKRServer:
                         "id": message.get("id"),
                         **response
                     }
-                    print(json.dumps(response_obj), flush=True)
+                    await self._send(response_obj)
 
             except json.JSONDecodeError as e:
                 error_response = {
@@ -159,7 +238,7 @@ class MCPIBKRServer:
                         "message": f"Parse error: {str(e)}"
                     }
                 }
-                print(json.dumps(error_response), flush=True)
+                await self._send(error_response)
 
             except Exception as e:
                 print(f"Error: {str(e)}", file=sys.stderr)
@@ -171,7 +250,7 @@ class MCPIBKRServer:
                         "message": f"Internal error: {str(e)}"
                     }
                 }
-                print(json.dumps(error_response), flush=True)
+                await self._send(error_response)
 
 
 def main():
@@ -4,11 +4,14 @@ Pytest configuration and shared fixtures for IBKR MCP server tests.
 
 import pytest
 import asyncio
-from unittest.mock import Mock, MagicMock, AsyncMock
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
 from pathlib import Path
 import json
 import tempfile
 from datetime import datetime
+from types import SimpleNamespace
+from dataclasses import dataclass
+from typing import Optional
 
 # Import modules under test
 import sys
@@ -16,7 +19,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from connection import IBKRConnectionManager, ConnectionMode
 from tools import IBKRTools
-from safety import SafetyValidator, SafetyLimits
+from safety import SafetyValidator, SafetyLimits, DictBackend
 
 
 # ==========================================
@@ -31,51 +34,78 @@ def mock_ib():
     ib.accountValues.return_value = []
     ib.portfolio.return_value = []
     ib.openTrades.return_value = []
+    # Awaited by the connection manager; tests only set return_value/side_effect
+    ib.connectAsync = AsyncMock()
+    ib.qualifyContractsAsync = AsyncMock()
+    ib.reqTickersAsync = AsyncMock()
+    ib.waitUntilReadyAsync = AsyncMock()
     return ib
 
 
-@pytest.fixture
+def _account_value(tag, value, currency="USD", account="DU1234567"):
+    """Plain stand-in for ib_insync AccountValue."""
+    return SimpleNamespace(tag=tag, value=value, currency=currency, account=account)
+
+
+@dataclass(slots=True)
+class FakeContract:
+    """Slotted stand-in for an ib_insync Contract."""
+    symbol: str
+    secType: str
+    strike: Optional[float] = None
+    right: Optional[str] = None
+    lastTradeDateOrContractMonth: Optional[str] = None
+
+
+@dataclass(slots=True)
+class FakePortfolioItem:
+    """Slotted stand-in for ib_insync PortfolioItem (no Mock attribute machinery)."""
+    contract: FakeContract
+    position: float
+    averageCost: float
+    marketPrice: float
+    marketValue: float
+    unrealizedPNL: float
+    realizedPNL: float
+
+
+def _portfolio_item(symbol, position, avgCost, marketPrice, marketValue, unrealizedPNL,
+                    realizedPNL, secType="OPT", strike=None, right=None, expiry=None):
+    """Plain stand-in for ib_insync PortfolioItem."""
+    return FakePortfolioItem(
+        contract=FakeContract(symbol, secType, strike, right, expiry),
+        position=position,
+        averageCost=avgCost,
+        marketPrice=marketPrice,
+        marketValue=marketValue,
+        unrealizedPNL=unrealizedPNL,
+        realizedPNL=realizedPNL
+    )
+
+
+@pytest.fixture(scope="session")
 def mock_account_values():
-    """Mock IBKR account values."""
-    class MockAccountValue:
-        def __init__(self, tag, value, currency="USD", account="DU1234567"):
-            self.tag = tag
-            self.value = value
-            self.currency = currency
-            self.account = account
-
-    return [
-        MockAccountValue("NetLiquidation", "25000.00"),
-        MockAccountValue("TotalCashValue", "15000.00"),
-        MockAccountValue("BuyingPower", "50000.00"),
-        MockAccountValue("UnrealizedPnL", "250.00"),
-        MockAccountValue("RealizedPnL", "1500.00"),
-    ]
+    """Mock IBKR account values (read-only, shared across the session)."""
+    return (
+        _account_value("NetLiquidation", "25000.00"),
+        _account_value("TotalCashValue", "15000.00"),
+        _account_value("BuyingPower", "50000.00"),
+        _account_value("UnrealizedPnL", "250.00"),
+        _account_value("RealizedPnL", "1500.00"),
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def mock_account_values_by_tag(mock_account_values):
+    """mock_account_values keyed by tag, as returned by get_account_values*()."""
+    return {av.tag: av for av in mock_account_values}
+
+
+@pytest.fixture(scope="session")
 def mock_portfolio_items():
-    """Mock IBKR portfolio items."""
-    class MockContract:
-        def __init__(self, symbol, secType="OPT", strike=None, right=None, expiry=None):
-            self.symbol = symbol
-            self.secType = secType
-            self.strike = strike
-            self.right = right
-            self.lastTradeDateOrContractMonth = expiry
-
-    class MockPortfolioItem:
-        def __init__(self, symbol, position, avgCost, marketPrice, marketValue, unrealizedPNL, realizedPNL, **kwargs):
-            self.contract = MockContract(symbol, **kwargs)
-            self.position = position
-            self.averageCost = avgCost
-            self.marketPrice = marketPrice
-            self.marketValue = marketValue
-            self.unrealizedPNL = unrealizedPNL
-            self.realizedPNL = realizedPNL
-
-    return [
-        MockPortfolioItem(
+    """Mock IBKR portfolio items (read-only, shared across the session)."""
+    return (
+        _portfolio_item(
             symbol="AAPL",
             secType="OPT",
             strike=175.0,
@@ -88,7 +118,7 @@ def mock_portfolio_items():
             unrealizedPNL=-25.00,
             realizedPNL=0.0
         ),
-        MockPortfolioItem(
+        _portfolio_item(
             symbol="AAPL",
             secType="OPT",
             strike=170.0,
@@ -101,26 +131,33 @@ def mock_portfolio_items():
             unrealizedPNL=20.00,
             realizedPNL=0.0
         ),
-    ]
+    )
+
+
+@pytest.fixture(scope="session")
+def large_portfolio():
+    """100 distinct portfolio items (50 short/long put pairs) for performance tests."""
+    items = []
+    for i in range(50):
+        strike = 100.0 + i
+        items.append(_portfolio_item(
+            symbol=f"SYM{i}", strike=strike, right="P", expiry="20251123",
+            position=-1, avgCost=1.25, marketPrice=1.50, marketValue=-150.00,
+            unrealizedPNL=-25.00, realizedPNL=0.0
+        ))
+        items.append(_portfolio_item(
+            symbol=f"SYM{i}", strike=strike - 5.0, right="P", expiry="20251123",
+            position=1, avgCost=0.80, marketPrice=0.60, marketValue=60.00,
+            unrealizedPNL=20.00, realizedPNL=0.0
+        ))
+    return tuple(items)
 
 
 @pytest.fixture
 def mock_trade():
     """Mock IBKR Trade object."""
-    class MockOrder:
-        def __init__(self):
-            self.orderId = 100001
-            self.orderType = "LMT"
-            self.action = "SELL"
-            self.totalQuantity = 1
-
-    class MockTrade:
-        def __init__(self):
-            self.order = MockOrder()
-            self.orderStatus = MagicMock()
-            self.orderStatus.status = "Submitted"
-
-    return MockTrade()
+    order = SimpleNamespace(orderId=100001, orderType="LMT", action="SELL", totalQuantity=1)
+    return SimpleNamespace(order=order, orderStatus=SimpleNamespace(status="Submitted"))
 
 
 # ==========================================
@@ -136,7 +173,7 @@ def connection_manager(monkeypatch, mock_ib):
     creating a real IBKR connection.
     """
     # Reset singleton
-    IBKRConnectionManager._instance = None
+    IBKRConnectionManager.reset()
 
     # Mock the IB class
     from ib_insync import IB
@@ -166,6 +203,39 @@ def ibkr_tools(connection_manager, monkeypatch):
     return tools
 
 
+@pytest.fixture
+def run_coroutines():
+    """
+    Patch IBKRTools._run to drive each coroutine on a fresh event loop.
+
+    The sync tool methods then really await the connection manager (and the
+    mocked IB client behind it) instead of getting a canned return value.
+    """
+    def run(coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    with patch.object(IBKRTools, "_run", side_effect=run) as mock_run:
+        yield mock_run
+
+
+@pytest.fixture
+def workspace_home(tmp_path, monkeypatch):
+    """
+    Point Path.home() at tmp_path with an empty agent memory file.
+
+    Keeps trade logs and recorded positions out of the real trading workspace.
+    """
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    memory_path = tmp_path / "trading_workspace" / "state" / "agent_memory.json"
+    memory_path.parent.mkdir(parents=True)
+    memory_path.write_text(json.dumps({"positions": {"open_trades": []}}))
+    return memory_path
+
+
 # ==========================================
 # Fixtures - Safety Validator
 # ==========================================
@@ -182,6 +252,29 @@ def safety_limits():
     return SafetyLimits()
 
 
+# ==========================================
+# Fixtures - Real IBKR (integration tests)
+# ==========================================
+
+@pytest.fixture(scope="session")
+def real_ibkr_tools():
+    """
+    IBKRTools bound to one real paper Gateway connection for the session.
+
+    The connection is opened by the first tool call and reused by every
+    integration test instead of reconnecting per test. The manager is
+    injected, so unit tests resetting the singleton don't affect it.
+    """
+    IBKRConnectionManager.reset()
+    manager = IBKRConnectionManager.instance()
+    tools = IBKRTools(connection_mode=ConnectionMode.PAPER_GATEWAY, connection_manager=manager)
+
+    yield tools
+
+    if manager.ib is not None and manager.ib.isConnected():
+        manager.ib.disconnect()
+
+
 # ==========================================
 # Fixtures - Agent Memory
 # ==========================================
@@ -226,6 +319,27 @@ def temp_agent_memory():
         temp_path.unlink()
 
 
+@pytest.fixture
+def in_memory_safety_state(safety_validator):
+    """
+    Agent memory dict served to safety_validator without touching disk.
+
+    Mutate it in place, then call safety_validator.reload_agent_state().
+    """
+    state = {
+        "agent_state": {"emergency_stop": False},
+        "positions": {"open_trades": []},
+        "safety_state": {
+            "daily_loss": 0.0,
+            "daily_loss_limit": 1000.0,
+            "circuit_breaker_triggered": False,
+            "consecutive_losses": 0
+        }
+    }
+    safety_validator.backend = DictBackend(state)
+    return state
+
+
 # ==========================================
 # Fixtures - Sample Orders
 # ==========================================
@@ -13,10 +13,11 @@ import asyncio
 from unittest.mock import Mock, MagicMock, patch, AsyncMock
 from datetime import datetime
 
+from ib_insync import Option, LimitOrder, Stock
+
 from connection import (
     IBKRConnectionManager,
-    ConnectionMode,
-    get_connection_manager
+    ConnectionMode
 )
 
 
@@ -25,7 +26,6 @@ from connection import (
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_connection_manager_singleton():
     """Test that connection manager is a singleton."""
     manager1 = IBKRConnectionManager()
@@ -34,10 +34,9 @@ async def test_connection_manager_singleton():
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_connect_paper_tws(connection_manager, mock_ib):
     """Test connection to paper trading TWS."""
-    mock_ib.connectAsync = AsyncMock(return_value=None)
+    mock_ib.connectAsync.return_value = None
     mock_ib.isConnected.return_value = True
 
     result = await connection_manager.connect(mode=ConnectionMode.PAPER_TWS)
@@ -49,10 +48,9 @@ async def test_connect_paper_tws(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_connect_failure(connection_manager, mock_ib):
     """Test connection failure handling."""
-    mock_ib.connectAsync = AsyncMock(side_effect=ConnectionError("Connection refused"))
+    mock_ib.connectAsync.side_effect = ConnectionError("Connection refused")
 
     with pytest.raises(ConnectionError, match="Connection refused"):
         await connection_manager.connect(mode=ConnectionMode.PAPER_TWS)
@@ -61,7 +59,6 @@ async def test_connect_failure(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_disconnect(connection_manager, mock_ib):
     """Test disconnection."""
     mock_ib.isConnected.return_value = True
@@ -74,11 +71,10 @@ async def test_disconnect(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_ensure_connected_when_disconnected(connection_manager, mock_ib):
     """Test ensure_connected reconnects when disconnected."""
     mock_ib.isConnected.return_value = False
-    mock_ib.connectAsync = AsyncMock(return_value=None)
+    mock_ib.connectAsync.return_value = None
     connection_manager.is_connected = False
     connection_manager.mode = ConnectionMode.PAPER_TWS
 
@@ -89,7 +85,6 @@ async def test_ensure_connected_when_disconnected(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_ensure_connected_max_retries(connection_manager, mock_ib):
     """Test ensure_connected fails after max retries."""
     mock_ib.isConnected.return_value = False
@@ -106,7 +101,6 @@ async def test_ensure_connected_max_retries(connection_manager, mock_ib):
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_health_check_healthy(connection_manager, mock_ib, mock_account_values):
     """Test health check when connection is healthy."""
     mock_ib.isConnected.return_value = True
@@ -124,7 +118,6 @@ async def test_health_check_healthy(connection_manager, mock_ib, mock_account_va
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_health_check_disconnected(connection_manager, mock_ib):
     """Test health check when disconnected."""
     mock_ib.isConnected.return_value = False
@@ -137,7 +130,6 @@ async def test_health_check_disconnected(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_health_check_unhealthy(connection_manager, mock_ib):
     """Test health check when connection exists but API calls fail."""
     mock_ib.isConnected.return_value = True
@@ -156,13 +148,11 @@ async def test_health_check_unhealthy(connection_manager, mock_ib):
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_get_account_values(connection_manager, mock_ib, mock_account_values):
     """Test retrieving account values."""
     mock_ib.isConnected.return_value = True
     mock_ib.accountValues.return_value = mock_account_values
     mock_ib.reqAccountSummary = Mock()
-    mock_ib.waitUntilReadyAsync = AsyncMock()
 
     values = await connection_manager.get_account_values()
 
@@ -173,7 +163,6 @@ async def test_get_account_values(connection_manager, mock_ib, mock_account_valu
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_get_portfolio_items(connection_manager, mock_ib, mock_portfolio_items):
     """Test retrieving portfolio items."""
     mock_ib.isConnected.return_value = True
@@ -191,15 +180,11 @@ async def test_get_portfolio_items(connection_manager, mock_ib, mock_portfolio_i
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_place_order(connection_manager, mock_ib, mock_trade):
     """Test placing an order."""
-    from ib_insync import Option, LimitOrder
-
     mock_ib.isConnected.return_value = True
-    mock_ib.qualifyContractsAsync = AsyncMock(return_value=[Option("AAPL", "20251123", 175.0, "P")])
+    mock_ib.qualifyContractsAsync.return_value = [Option("AAPL", "20251123", 175.0, "P")]
     mock_ib.placeOrder.return_value = mock_trade
-    mock_ib.waitUntilReadyAsync = AsyncMock()
 
     contract = Option("AAPL", "20251123", 175.0, "P")
     order = LimitOrder("SELL", 1, 1.50)
@@ -211,13 +196,33 @@ async def test_place_order(connection_manager, mock_ib, mock_trade):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
+async def test_place_order_reuses_qualified_contract(connection_manager, mock_ib, mock_trade):
+    """Test repeat orders on the same contract only qualify it once."""
+    qualified = Option("AAPL", "20251123", 175.0, "P")
+    qualified.conId = 123456
+    mock_ib.isConnected.return_value = True
+    mock_ib.qualifyContractsAsync.return_value = [qualified]
+    mock_ib.placeOrder.return_value = mock_trade
+
+    for _ in range(2):
+        await connection_manager.place_order(
+            Option("AAPL", "20251123", 175.0, "P"), LimitOrder("SELL", 1, 1.50)
+        )
+
+    mock_ib.qualifyContractsAsync.assert_awaited_once()
+    assert mock_ib.placeOrder.call_count == 2
+    placed = [call.args[0] for call in mock_ib.placeOrder.call_args_list]
+    assert placed == [qualified, qualified]
+    # Each order gets its own copy, so mutating one can't leak into the next
+    assert placed[0] is not placed[1]
+    assert all(contract is not qualified for contract in placed)
+
+
+@pytest.mark.unit
 async def test_place_order_invalid_contract(connection_manager, mock_ib):
     """Test placing order with invalid contract."""
-    from ib_insync import Option, LimitOrder
-
     mock_ib.isConnected.return_value = True
-    mock_ib.qualifyContractsAsync = AsyncMock(return_value=[])  # Contract not found
+    mock_ib.qualifyContractsAsync.return_value = []  # Contract not found
 
     contract = Option("INVALID", "20251123", 999.0, "P")
     order = LimitOrder("SELL", 1, 1.50)
@@ -227,14 +232,10 @@ async def test_place_order_invalid_contract(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_cancel_order(connection_manager, mock_ib):
     """Test canceling an order."""
-    from ib_insync import LimitOrder
-
     mock_ib.isConnected.return_value = True
     mock_ib.cancelOrder = Mock()
-    mock_ib.waitUntilReadyAsync = AsyncMock()
 
     order = LimitOrder("SELL", 1, 1.50)
     order.orderId = 100001
@@ -245,7 +246,6 @@ async def test_cancel_order(connection_manager, mock_ib):
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_get_open_trades(connection_manager, mock_ib, mock_trade):
     """Test retrieving open trades."""
     mock_ib.isConnected.return_value = True
@@ -262,45 +262,35 @@ async def test_get_open_trades(connection_manager, mock_ib, mock_trade):
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_get_current_price(connection_manager, mock_ib):
     """Test getting current price for a contract."""
-    from ib_insync import Stock
-
     mock_ticker = Mock()
     mock_ticker.last = 180.50
     mock_ticker.bid = 180.45
     mock_ticker.ask = 180.55
 
     mock_ib.isConnected.return_value = True
-    mock_ib.qualifyContractsAsync = AsyncMock(return_value=[Stock("AAPL", "SMART", "USD")])
-    mock_ib.reqMktData.return_value = mock_ticker
-    mock_ib.waitUntilReadyAsync = AsyncMock()
-    mock_ib.cancelMktData = Mock()
+    mock_ib.qualifyContractsAsync.return_value = [Stock("AAPL", "SMART", "USD")]
+    mock_ib.reqTickersAsync.return_value = [mock_ticker]
 
     contract = Stock("AAPL", "SMART", "USD")
     price = await connection_manager.get_current_price(contract)
 
     assert price == 180.50
-    mock_ib.cancelMktData.assert_called_once()
+    mock_ib.reqTickersAsync.assert_awaited_once()
 
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_get_current_price_use_midpoint(connection_manager, mock_ib):
     """Test getting price using bid/ask midpoint when last is unavailable."""
-    from ib_insync import Stock
-
     mock_ticker = Mock()
     mock_ticker.last = None
     mock_ticker.bid = 180.45
     mock_ticker.ask = 180.55
 
     mock_ib.isConnected.return_value = True
-    mock_ib.qualifyContractsAsync = AsyncMock(return_value=[Stock("AAPL", "SMART", "USD")])
-    mock_ib.reqMktData.return_value = mock_ticker
-    mock_ib.waitUntilReadyAsync = AsyncMock()
-    mock_ib.cancelMktData = Mock()
+    mock_ib.qualifyContractsAsync.return_value = [Stock("AAPL", "SMART", "USD")]
+    mock_ib.reqTickersAsync.return_value = [mock_ticker]
 
     contract = Stock("AAPL", "SMART", "USD")
     price = await connection_manager.get_current_price(contract)
@@ -308,6 +298,26 @@ async def test_get_current_price_use_midpoint(connection_manager, mock_ib):
     assert price == 180.50  # (180.45 + 180.55) / 2
 
 
+@pytest.mark.unit
+async def test_get_current_prices_batch(connection_manager, mock_ib):
+    """Test batched price lookup qualifies and snapshots once, keeping input order."""
+    aapl = Stock("AAPL", "SMART", "USD")
+    msft = Stock("MSFT", "SMART", "USD")
+
+    mock_ib.isConnected.return_value = True
+    mock_ib.qualifyContractsAsync.return_value = [aapl, msft]
+    mock_ib.reqTickersAsync.return_value = [
+        Mock(last=180.50, bid=180.45, ask=180.55),
+        Mock(last=None, bid=410.00, ask=410.20),
+    ]
+
+    prices = await connection_manager.get_current_prices([aapl, msft])
+
+    assert prices == [180.50, pytest.approx(410.10)]
+    mock_ib.qualifyContractsAsync.assert_awaited_once_with(aapl, msft)
+    mock_ib.reqTickersAsync.assert_awaited_once_with(aapl, msft)
+
+
 # ==========================================
 # Event Handler Tests
 # ==========================================
@@ -335,25 +345,14 @@ def test_on_disconnected_event(connection_manager):
 
 
 @pytest.mark.unit
-def test_on_error_event_info(connection_manager):
-    """Test _on_error with info message (code 2104)."""
-    # Should log as debug, not error
-    connection_manager._on_error(0, 2104, "Market data farm connection is OK", None)
-    # No assertion needed - just verify it doesn't raise
-
-
-@pytest.mark.unit
-def test_on_error_event_warning(connection_manager):
-    """Test _on_error with warning message (code >= 2000)."""
-    connection_manager._on_error(0, 2110, "Connectivity between IB and TWS has been restored", None)
-    # Should log as warning
-
-
-@pytest.mark.unit
-def test_on_error_event_error(connection_manager):
-    """Test _on_error with actual error (code < 2000)."""
-    connection_manager._on_error(100, 201, "Order rejected - insufficient margin", None)
-    # Should log as error
+@pytest.mark.parametrize("req_id, error_code, error_string", [
+    (0, 2104, "Market data farm connection is OK"),  # info: logged as debug
+    (0, 2110, "Connectivity between IB and TWS has been restored"),  # warning (code >= 2000)
+    (100, 201, "Order rejected - insufficient margin"),  # error (code < 2000)
+], ids=["info", "warning", "error"])
+def test_on_error_event(connection_manager, req_id, error_code, error_string):
+    """Test _on_error handles info, warning and error codes without raising."""
+    connection_manager._on_error(req_id, error_code, error_string, None)
 
 
 # ==========================================
@@ -377,14 +376,13 @@ def test_connection_modes():
 # ==========================================
 
 @pytest.mark.unit
-def test_get_connection_manager_singleton():
-    """Test get_connection_manager returns singleton."""
+def test_instance_singleton():
+    """Test IBKRConnectionManager.instance() returns singleton."""
     # Reset singleton
-    from connection import _manager
-    import connection as conn_module
-    conn_module._manager = None
+    IBKRConnectionManager.reset()
 
-    manager1 = get_connection_manager()
-    manager2 = get_connection_manager()
+    manager1 = IBKRConnectionManager.instance()
+    manager2 = IBKRConnectionManager.instance()
 
     assert manager1 is manager2
+    assert manager1 is IBKRConnectionManager()
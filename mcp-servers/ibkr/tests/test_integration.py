@@ -18,11 +18,12 @@ import pytest
 import asyncio
 import time
 import gc
+import itertools
 import tracemalloc
 from unittest.mock import Mock, patch, AsyncMock
 from pathlib import Path
 
-from connection import IBKRConnectionManager, ConnectionMode, get_connection_manager
+from connection import IBKRConnectionManager, ConnectionMode
 from tools import IBKRTools
 from safety import SafetyValidator
 
@@ -32,22 +33,25 @@ from safety import SafetyValidator
 # ==========================================
 
 @pytest.mark.unit
-def test_iron_condor_four_legs(ibkr_tools, sample_iron_condor_order, mock_trade):
+def test_iron_condor_four_legs(ibkr_tools, mock_ib, sample_iron_condor_order, mock_trade,
+                               run_coroutines, workspace_home):
     """Test Iron Condor with all 4 legs executes correctly."""
+    # IB qualifies and accepts each leg
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    mock_ib.qualifyContractsAsync.side_effect = lambda contract: [contract]
+    mock_ib.placeOrder.return_value = mock_trade
 
-    # Mock order placement for each leg
-    with patch('asyncio.run', return_value=mock_trade):
-        result = ibkr_tools.place_order(
-            symbol=sample_iron_condor_order["symbol"],
-            strategy=sample_iron_condor_order["strategy"],
-            legs=sample_iron_condor_order["legs"],
-            max_risk=sample_iron_condor_order["max_risk"],
-            capital_required=sample_iron_condor_order["capital_required"]
-        )
+    result = ibkr_tools.place_order(
+        symbol=sample_iron_condor_order["symbol"],
+        strategy=sample_iron_condor_order["strategy"],
+        legs=sample_iron_condor_order["legs"],
+        max_risk=sample_iron_condor_order["max_risk"],
+        capital_required=sample_iron_condor_order["capital_required"]
+    )
 
     assert result["success"] is True
     assert len(result["order_ids"]) == 4
+    assert run_coroutines.call_count == 4
 
     # Verify trade ID format
     trade_id = result["trade_id"]
@@ -56,18 +60,20 @@ def test_iron_condor_four_legs(ibkr_tools, sample_iron_condor_order, mock_trade)
 
 
 @pytest.mark.unit
-def test_credit_spread_two_legs(ibkr_tools, sample_credit_spread_order, mock_trade):
+def test_credit_spread_two_legs(ibkr_tools, mock_ib, sample_credit_spread_order, mock_trade,
+                                run_coroutines, workspace_home):
     """Test Credit Spread with 2 legs executes correctly."""
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    mock_ib.qualifyContractsAsync.side_effect = lambda contract: [contract]
+    mock_ib.placeOrder.return_value = mock_trade
 
-    with patch('asyncio.run', return_value=mock_trade):
-        result = ibkr_tools.place_order(
-            symbol=sample_credit_spread_order["symbol"],
-            strategy=sample_credit_spread_order["strategy"],
-            legs=sample_credit_spread_order["legs"],
-            max_risk=sample_credit_spread_order["max_risk"],
-            capital_required=sample_credit_spread_order["capital_required"]
-        )
+    result = ibkr_tools.place_order(
+        symbol=sample_credit_spread_order["symbol"],
+        strategy=sample_credit_spread_order["strategy"],
+        legs=sample_credit_spread_order["legs"],
+        max_risk=sample_credit_spread_order["max_risk"],
+        capital_required=sample_credit_spread_order["capital_required"]
+    )
 
     assert result["success"] is True
     assert len(result["order_ids"]) == 2
@@ -80,15 +86,16 @@ def test_partial_leg_failure(ibkr_tools, sample_iron_condor_order):
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
 
     # First 3 legs succeed, 4th fails
-    call_count = [0]
+    leg_number = itertools.count(1)
 
     def mock_place_side_effect(coro):
-        call_count[0] += 1
-        if call_count[0] == 4:
+        coro.close()
+        i = next(leg_number)
+        if i == 4:
             raise Exception("Order rejected by exchange")
-        return Mock(order=Mock(orderId=100000 + call_count[0]))
+        return Mock(order=Mock(orderId=100000 + i))
 
-    with patch('asyncio.run', side_effect=mock_place_side_effect):
+    with patch('tools.IBKRTools._run', side_effect=mock_place_side_effect):
         result = ibkr_tools.place_order(
             symbol=sample_iron_condor_order["symbol"],
             strategy=sample_iron_condor_order["strategy"],
@@ -97,9 +104,68 @@ def test_partial_leg_failure(ibkr_tools, sample_iron_condor_order):
             capital_required=sample_iron_condor_order["capital_required"]
         )
 
-    # Should fail and report error
+    # Should fail, report the legs IBKR accepted, and cancel them
     assert result["success"] is False
     assert "Failed to execute order" in result["message"]
+    assert result["order_ids"] == [100001, 100002, 100003]
+    assert result["cancelled_order_ids"] == [100001, 100002, 100003]
+
+
+@pytest.mark.unit
+async def test_qualify_failure_cancels_pending_legs(ibkr_tools, sample_iron_condor_order):
+    """Test a leg that fails qualification cancels the other legs' pending qualifications."""
+    ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    manager = ibkr_tools.connection_manager
+    pending = []
+
+    async def qualify(contract):
+        if not pending:
+            pending.append(asyncio.current_task())
+            await asyncio.Event().wait()  # Never answered
+        raise ValueError(f"Could not qualify contract: {contract}")
+
+    with patch.object(manager, 'qualify_contract', side_effect=qualify), \
+            patch.object(manager, 'place_order', AsyncMock()) as place:
+        result = await ibkr_tools.place_order_async(
+            symbol=sample_iron_condor_order["symbol"],
+            strategy=sample_iron_condor_order["strategy"],
+            legs=sample_iron_condor_order["legs"],
+            max_risk=sample_iron_condor_order["max_risk"],
+            capital_required=sample_iron_condor_order["capital_required"]
+        )
+
+    assert pending[0].cancelled()
+    place.assert_not_awaited()
+    assert result["success"] is False
+    assert result["order_ids"] == []
+    assert "Could not qualify contract" in result["message"]
+
+
+@pytest.mark.unit
+async def test_partial_leg_failure_async(ibkr_tools, sample_iron_condor_order):
+    """Test place_order_async cancels and reports legs placed before a leg fails."""
+    ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    manager = ibkr_tools.connection_manager
+    placed = [Mock(order=Mock(orderId=100001 + i)) for i in range(3)]
+
+    with patch.object(manager, 'qualify_contract', AsyncMock()), \
+            patch.object(manager, 'place_order',
+                         AsyncMock(side_effect=placed + [Exception("Order rejected by exchange")])) as place, \
+            patch.object(manager, 'cancel_order', AsyncMock()) as cancel:
+        result = await ibkr_tools.place_order_async(
+            symbol=sample_iron_condor_order["symbol"],
+            strategy=sample_iron_condor_order["strategy"],
+            legs=sample_iron_condor_order["legs"],
+            max_risk=sample_iron_condor_order["max_risk"],
+            capital_required=sample_iron_condor_order["capital_required"]
+        )
+
+    assert place.await_count == 4
+    assert [c.args[0] for c in cancel.await_args_list] == [t.order for t in placed]
+    assert result["success"] is False
+    assert result["order_ids"] == [100001, 100002, 100003]
+    assert result["cancelled_order_ids"] == [100001, 100002, 100003]
+    assert "Order rejected by exchange" in result["message"]
 
 
 # ==========================================
@@ -107,7 +173,6 @@ def test_partial_leg_failure(ibkr_tools, sample_iron_condor_order):
 # ==========================================
 
 @pytest.mark.unit
-@pytest.mark.asyncio
 async def test_handle_connection_loss(connection_manager, mock_ib):
     """Test handling sudden connection loss."""
     mock_ib.isConnected.return_value = False
@@ -115,8 +180,6 @@ async def test_handle_connection_loss(connection_manager, mock_ib):
     connection_manager.mode = ConnectionMode.PAPER_TWS
     connection_manager.reconnect_attempts = 0
 
-    mock_ib.connectAsync = AsyncMock()
-
     # Should attempt reconnection
     await connection_manager.ensure_connected()
 
@@ -162,30 +225,16 @@ def test_handle_invalid_contract_data(ibkr_tools):
 
 
 @pytest.mark.unit
-def test_handle_api_rate_limiting(ibkr_tools, sample_iron_condor_order):
-    """Test handling IBKR API rate limiting."""
-    ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
-
-    # Simulate rate limit error
-    with patch('asyncio.run', side_effect=Exception("Pacing violation")):
-        result = ibkr_tools.place_order(
-            symbol=sample_iron_condor_order["symbol"],
-            strategy=sample_iron_condor_order["strategy"],
-            legs=sample_iron_condor_order["legs"],
-            max_risk=sample_iron_condor_order["max_risk"],
-            capital_required=sample_iron_condor_order["capital_required"]
-        )
-
-    assert result["success"] is False
-    assert "Pacing violation" in result["message"]
-
-
-@pytest.mark.unit
-def test_handle_market_closed(ibkr_tools, sample_iron_condor_order):
-    """Test handling orders when market is closed."""
+@pytest.mark.parametrize("error_message", [
+    "Pacing violation",  # API rate limiting
+    "Market closed",
+    "Order rejected",
+])
+def test_handle_order_submission_error(ibkr_tools, sample_iron_condor_order, error_message):
+    """Test IBKR errors during submission (rate limiting, market closed, rejection) fail the order."""
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
 
-    with patch('asyncio.run', side_effect=Exception("Market closed")):
+    with patch('tools.IBKRTools._run', side_effect=Exception(error_message)):
         result = ibkr_tools.place_order(
             symbol=sample_iron_condor_order["symbol"],
             strategy=sample_iron_condor_order["strategy"],
@@ -195,6 +244,7 @@ def test_handle_market_closed(ibkr_tools, sample_iron_condor_order):
         )
 
     assert result["success"] is False
+    assert error_message in result["message"]
 
 
 # ==========================================
@@ -243,7 +293,7 @@ def test_single_leg_order(ibkr_tools, mock_trade):
         "capital_required": 5000.0
     }
 
-    with patch('asyncio.run', return_value=mock_trade):
+    with patch('tools.IBKRTools._run', return_value=mock_trade):
         result = ibkr_tools.place_order(
             symbol=single_leg_order["symbol"],
             strategy=single_leg_order["strategy"],
@@ -276,7 +326,7 @@ def test_very_large_multi_leg_order(ibkr_tools, mock_trade):
             "price": 1.0 + i * 0.1
         })
 
-    with patch('asyncio.run', return_value=mock_trade):
+    with patch('tools.IBKRTools._run', return_value=mock_trade):
         result = ibkr_tools.place_order(
             symbol="AAPL",
             strategy="Complex",
@@ -295,25 +345,45 @@ def test_very_large_multi_leg_order(ibkr_tools, mock_trade):
 
 @pytest.mark.performance
 @pytest.mark.slow
-def test_50_consecutive_api_calls(ibkr_tools, mock_account_values):
+@patch.object(IBKRTools, '_run')
+def test_50_consecutive_api_calls(mock_run, ibkr_tools, mock_account_values_by_tag, mock_portfolio_items):
     """Test 50+ consecutive API calls without memory leak."""
+    # get_account runs two coroutines per call: account values, then portfolio
+    responses = itertools.cycle([mock_account_values_by_tag, mock_portfolio_items])
+
+    def run(coro):
+        coro.close()
+        return next(responses)
+
+    mock_run.side_effect = run
+
     # Start memory tracking
     tracemalloc.start()
     gc.collect()
     snapshot_start = tracemalloc.take_snapshot()
 
     # Perform 50 get_account calls
-    with patch('asyncio.run', return_value={av.tag: av for av in mock_account_values}):
-        for i in range(50):
-            account = ibkr_tools.get_account()
-            assert "net_liquidation" in account
+    for i in range(50):
+        ibkr_tools._invalidate_account_cache()  # Hit IBKR every time, not the short-lived cache
+        account = ibkr_tools.get_account()
+        assert "net_liquidation" in account
+
+    assert mock_run.call_count == 100
 
     # Check memory
     gc.collect()
     snapshot_end = tracemalloc.take_snapshot()
 
-    # Calculate memory difference
-    top_stats = snapshot_end.compare_to(snapshot_start, 'lineno')
+    # Only count allocations made by the code under test, not pytest/mock internals
+    filters = [
+        tracemalloc.Filter(True, "*/tools.py"),
+        tracemalloc.Filter(True, "*/connection.py"),
+    ]
+    snapshot_start = snapshot_start.filter_traces(filters)
+    snapshot_end = snapshot_end.filter_traces(filters)
+
+    # Calculate memory difference (only the total matters, so group per file)
+    top_stats = snapshot_end.compare_to(snapshot_start, 'filename')
 
     # Total memory increase should be minimal (< 1 MB for 50 calls)
     total_diff = sum(stat.size_diff for stat in top_stats)
@@ -325,18 +395,12 @@ def test_50_consecutive_api_calls(ibkr_tools, mock_account_values):
 
 
 @pytest.mark.performance
-def test_get_positions_performance(ibkr_tools, mock_portfolio_items):
+def test_get_positions_performance(ibkr_tools, large_portfolio):
     """Test get_positions performance with many positions."""
-    # Create 100 portfolio items
-    large_portfolio = mock_portfolio_items * 50  # 100 items
-
-    start_time = time.time()
-
-    with patch('asyncio.run', return_value=large_portfolio):
+    with patch('tools.IBKRTools._run', return_value=large_portfolio):
+        start_ns = time.perf_counter_ns()
         positions = ibkr_tools.get_positions()
-
-    end_time = time.time()
-    duration = end_time - start_time
+        duration = (time.perf_counter_ns() - start_ns) / 1e9
 
     assert len(positions) == 100
     # Should complete in under 1 second
@@ -345,28 +409,16 @@ def test_get_positions_performance(ibkr_tools, mock_portfolio_items):
 
 @pytest.mark.performance
 @pytest.mark.slow
-def test_concurrent_health_checks(ibkr_tools):
+async def test_concurrent_health_checks(ibkr_tools):
     """Test multiple concurrent health checks don't deadlock."""
-    import threading
-
-    results = []
-
-    def run_health_check():
-        with patch('asyncio.run', return_value={"status": "healthy", "is_connected": True}):
-            result = ibkr_tools.health_check()
-            results.append(result)
+    health = {"status": "healthy", "is_connected": True}
 
-    # Run 10 health checks concurrently
-    threads = []
-    for i in range(10):
-        thread = threading.Thread(target=run_health_check)
-        threads.append(thread)
-        thread.start()
-
-    # Wait for all threads
-    for thread in threads:
-        thread.join(timeout=5.0)
-        assert not thread.is_alive(), "Health check thread deadlocked"
+    # Run 10 health checks concurrently on the test's event loop
+    with patch.object(ibkr_tools.connection_manager, 'health_check', AsyncMock(return_value=health)):
+        results = await asyncio.wait_for(
+            asyncio.gather(*(ibkr_tools.health_check_async() for _ in range(10))),
+            timeout=5.0
+        )
 
     assert len(results) == 10
     assert all(r["status"] == "healthy" for r in results)
@@ -378,7 +430,6 @@ def test_concurrent_health_checks(ibkr_tools):
 
 @pytest.mark.integration
 @pytest.mark.slow
-@pytest.mark.asyncio
 async def test_real_ibkr_connection():
     """
     Test real connection to IBKR paper trading.
@@ -388,14 +439,12 @@ async def test_real_ibkr_connection():
     - Paper trading account
     - API enabled on port 4002 (Gateway) or 7497 (TWS)
 
-    Skip if IBKR not available.
+    Deselected by default (see pytest.ini); run with -m integration.
     """
-    # pytest.skip("Integration test - requires real IBKR connection")
-
     # Reset singleton
-    IBKRConnectionManager._instance = None
+    IBKRConnectionManager.reset()
 
-    manager = get_connection_manager()
+    manager = IBKRConnectionManager.instance()
 
     try:
         # Attempt connection to Paper Gateway (port 4002)
@@ -424,17 +473,13 @@ async def test_real_ibkr_connection():
 
 @pytest.mark.integration
 @pytest.mark.slow
-def test_real_ibkr_get_account():
+def test_real_ibkr_get_account(real_ibkr_tools):
     """
     Test get_account with real IBKR connection.
 
-    Skip if IBKR not available.
+    Deselected by default (see pytest.ini); run with -m integration.
     """
-    # pytest.skip("Integration test - requires real IBKR connection")
-
-    tools = IBKRTools(connection_mode=ConnectionMode.PAPER_GATEWAY)
-
-    account = tools.get_account()
+    account = real_ibkr_tools.get_account()
 
     # Verify response structure
     assert "account_id" in account
@@ -445,17 +490,13 @@ def test_real_ibkr_get_account():
 
 @pytest.mark.integration
 @pytest.mark.slow
-def test_real_ibkr_get_positions():
+def test_real_ibkr_get_positions(real_ibkr_tools):
     """
     Test get_positions with real IBKR connection.
 
-    Skip if IBKR not available.
+    Deselected by default (see pytest.ini); run with -m integration.
     """
-    # pytest.skip("Integration test - requires real IBKR connection")
-
-    tools = IBKRTools(connection_mode=ConnectionMode.PAPER_GATEWAY)
-
-    positions = tools.get_positions()
+    positions = real_ibkr_tools.get_positions()
 
     # Positions may be empty list if no positions
     assert isinstance(positions, list)
@@ -13,14 +13,18 @@ Tests all safety validation scenarios:
 import pytest
 from pathlib import Path
 import json
+import os
 import tempfile
 from datetime import datetime
 
 from safety import (
     SafetyValidator,
     SafetyLimits,
+    FileBackend,
     ViolationType,
-    create_safety_validator
+    create_safety_validator,
+    update_agent_memory,
+    _read_agent_memory
 )
 
 
@@ -85,16 +89,11 @@ def test_validate_order_max_risk_fail(safety_validator):
 # ==========================================
 
 @pytest.mark.unit
-def test_validate_order_daily_loss_pass(safety_validator, temp_agent_memory):
+def test_validate_order_daily_loss_pass(safety_validator, in_memory_safety_state):
     """Test order passes daily loss validation."""
     # Set daily loss to $500 (under $1000 limit)
-    with open(temp_agent_memory, 'r') as f:
-        memory = json.load(f)
-
-    memory["safety_state"]["daily_loss"] = 500.0
-
-    with open(temp_agent_memory, 'w') as f:
-        json.dump(memory, f)
+    in_memory_safety_state["safety_state"]["daily_loss"] = 500.0
+    safety_validator.reload_agent_state()
 
     order = {
         "symbol": "AAPL",
@@ -103,25 +102,17 @@ def test_validate_order_daily_loss_pass(safety_validator, temp_agent_memory):
         "legs": []
     }
 
-    # Mock memory path
-    safety_validator.agent_memory_path = temp_agent_memory
-
     is_valid, error = safety_validator.validate_order(order)
 
     assert is_valid is True
 
 
 @pytest.mark.unit
-def test_validate_order_daily_loss_fail(safety_validator, temp_agent_memory):
+def test_validate_order_daily_loss_fail(safety_validator, in_memory_safety_state):
     """Test order fails daily loss validation."""
     # Set daily loss to $1000 (at limit)
-    with open(temp_agent_memory, 'r') as f:
-        memory = json.load(f)
-
-    memory["safety_state"]["daily_loss"] = 1000.0
-
-    with open(temp_agent_memory, 'w') as f:
-        json.dump(memory, f)
+    in_memory_safety_state["safety_state"]["daily_loss"] = 1000.0
+    safety_validator.reload_agent_state()
 
     order = {
         "symbol": "AAPL",
@@ -130,8 +121,6 @@ def test_validate_order_daily_loss_fail(safety_validator, temp_agent_memory):
         "legs": []
     }
 
-    safety_validator.agent_memory_path = temp_agent_memory
-
     is_valid, error = safety_validator.validate_order(order)
 
     assert is_valid is False
@@ -144,26 +133,22 @@ def test_validate_order_daily_loss_fail(safety_validator, temp_agent_memory):
 # ==========================================
 
 @pytest.mark.unit
-def test_validate_order_concentration_pass(safety_validator, temp_agent_memory):
+def test_validate_order_concentration_pass(safety_validator, in_memory_safety_state):
     """Test order passes concentration validation."""
     # Add existing positions
-    with open(temp_agent_memory, 'r') as f:
-        memory = json.load(f)
-
-    memory["positions"]["open_trades"] = [
+    in_memory_safety_state["positions"]["open_trades"] = [
         {
             "symbol": "AAPL",
             "capital_at_risk": 1000.0
         }
     ]
 
-    # Portfolio value = $25,000 (from get_account)
+    # Portfolio value = $25,000
     # Existing AAPL exposure = $1,000 (4%)
     # New trade = $400
     # Total AAPL = $1,400 (5.6%) < 30% limit
-
-    with open(temp_agent_memory, 'w') as f:
-        json.dump(memory, f)
+    safety_validator.limits = SafetyLimits(MAX_TOTAL_EXPOSURE=25000.0)
+    safety_validator.reload_agent_state()
 
     order = {
         "symbol": "AAPL",
@@ -172,32 +157,23 @@ def test_validate_order_concentration_pass(safety_validator, temp_agent_memory):
         "legs": []
     }
 
-    safety_validator.agent_memory_path = temp_agent_memory
-
-    # Mock get_account to return $25,000 portfolio
-    from unittest.mock import patch
-    with patch('safety.SafetyValidator._get_portfolio_value', return_value=25000.0):
-        is_valid, error = safety_validator.validate_order(order)
+    is_valid, error = safety_validator.validate_order(order)
 
     assert is_valid is True
 
 
 @pytest.mark.unit
-def test_validate_order_concentration_fail(safety_validator, temp_agent_memory):
+def test_validate_order_concentration_fail(safety_validator, in_memory_safety_state):
     """Test order fails concentration validation."""
     # Add large existing position in AAPL
-    with open(temp_agent_memory, 'r') as f:
-        memory = json.load(f)
-
-    memory["positions"]["open_trades"] = [
+    in_memory_safety_state["positions"]["open_trades"] = [
         {
             "symbol": "AAPL",
             "capital_at_risk": 6000.0  # Already 24% of $25k portfolio
         }
     ]
-
-    with open(temp_agent_memory, 'w') as f:
-        json.dump(memory, f)
+    safety_validator.limits = SafetyLimits(MAX_TOTAL_EXPOSURE=25000.0)
+    safety_validator.reload_agent_state()
 
     order = {
         "symbol": "AAPL",
@@ -206,15 +182,11 @@ def test_validate_order_concentration_fail(safety_validator, temp_agent_memory):
         "legs": []
     }
 
-    safety_validator.agent_memory_path = temp_agent_memory
-
-    from unittest.mock import patch
-    with patch('safety.SafetyValidator._get_portfolio_value', return_value=25000.0):
-        is_valid, error = safety_validator.validate_order(order)
+    is_valid, error = safety_validator.validate_order(order)
 
     assert is_valid is False
     assert "Concentration limit" in error
-    assert "30%" in error
+    assert "(32.0% > 30.0%)" in error
 
 
 # ==========================================
@@ -421,6 +393,37 @@ def test_trigger_circuit_breaker(safety_validator, temp_agent_memory, tmp_path):
     assert "10% drawdown" in content
 
 
+@pytest.mark.unit
+def test_circuit_breaker_persists_to_backend(safety_validator, in_memory_safety_state):
+    """Test a triggered circuit breaker is written through the injected backend."""
+    safety_validator.reload_agent_state()
+
+    assert safety_validator.check_circuit_breaker(account_value=8500.0, initial_value=10000.0) is True
+
+    state = safety_validator.backend.read()
+    assert state["safety_state"]["circuit_breaker_triggered"] is True
+    assert "circuit_breaker_timestamp" in state["safety_state"]
+
+
+@pytest.mark.unit
+def test_circuit_breaker_keeps_newer_positions(temp_agent_memory):
+    """Test tripping the breaker doesn't overwrite positions saved after the validator loaded."""
+    validator = SafetyValidator(backend=FileBackend(temp_agent_memory))
+
+    def add_trade(memory):
+        memory["positions"]["open_trades"].append({"trade_id": "T1", "symbol": "AAPL"})
+        return "T1"
+
+    update_agent_memory(add_trade, temp_agent_memory)
+
+    assert validator.check_circuit_breaker(account_value=8500.0, initial_value=10000.0) is True
+
+    with open(temp_agent_memory, 'r') as f:
+        memory = json.load(f)
+    assert memory["safety_state"]["circuit_breaker_triggered"] is True
+    assert memory["positions"]["open_trades"] == [{"trade_id": "T1", "symbol": "AAPL"}]
+
+
 # ==========================================
 # Factory Function Tests
 # ==========================================
@@ -516,3 +519,70 @@ def test_validate_order_multiple_violations(safety_validator, temp_agent_memory)
     assert is_valid is False
     # Should report first violation encountered
     assert error != ""
+
+
+# ==========================================
+# Batch Validation Tests
+# ==========================================
+
+@pytest.mark.unit
+def test_validate_orders_batch_matches_validate_order(safety_validator):
+    """Test batch validation returns the same results as per-order validation."""
+    limits = safety_validator.limits
+    orders = [
+        {"symbol": "AAPL", "max_risk": 100.0, "capital_required": 200.0, "legs": []},
+        {"symbol": "AAPL", "max_risk": limits.MAX_TRADE_RISK + 1, "capital_required": 200.0},
+        {"symbol": "MSFT", "max_risk": 100.0, "capital_required": limits.MAX_TRADE_CAPITAL + 1},
+        {"symbol": "SPY", "max_risk": 100.0, "capital_required": 200.0,
+         "legs": [{"price": 1.0}, {"price": limits.MIN_OPTION_PRICE / 2}]},
+        {"symbol": "QQQ", "max_risk": 100.0, "capital_required": 200.0,
+         "legs": [{"price": 1.0, "spread_width": limits.MAX_SPREAD_WIDTH + 1}]},
+        {"max_risk": 100.0, "capital_required": limits.MAX_TRADE_CAPITAL},
+        {"symbol": "TSLA", "max_risk": 100.0,
+         "capital_required": limits.MAX_TOTAL_EXPOSURE * limits.MAX_CONCENTRATION + 1},
+    ]
+
+    results = safety_validator.validate_orders_batch(orders)
+
+    assert results == [safety_validator.validate_order(order) for order in orders]
+    assert safety_validator.validate_orders_batch([]) == []
+
+
+# ==========================================
+# Agent Memory Update Tests
+# ==========================================
+
+@pytest.mark.unit
+def test_update_agent_memory(temp_agent_memory):
+    """Test update_agent_memory persists changes and skips the write when nothing changed."""
+    def add_trade(memory):
+        memory["positions"]["open_trades"].append({"trade_id": "T1", "symbol": "AAPL"})
+        return "T1"
+
+    assert update_agent_memory(add_trade, temp_agent_memory) == "T1"
+    with open(temp_agent_memory, 'r') as f:
+        assert json.load(f)["positions"]["open_trades"] == [{"trade_id": "T1", "symbol": "AAPL"}]
+
+    mtime_ns = temp_agent_memory.stat().st_mtime_ns
+    assert update_agent_memory(lambda memory: None, temp_agent_memory) is None
+    assert temp_agent_memory.stat().st_mtime_ns == mtime_ns
+
+    with pytest.raises(FileNotFoundError):
+        update_agent_memory(add_trade, temp_agent_memory.with_name("missing.json"))
+
+
+@pytest.mark.unit
+def test_read_agent_memory_sees_same_size_replace(tmp_path):
+    """A same-size file swapped in with an identical mtime is still re-parsed."""
+    memory_path = tmp_path / "agent_memory.json"
+    memory_path.write_text('{"emergency_stop": false}')
+    assert _read_agent_memory(memory_path) == {"emergency_stop": False}
+
+    st = memory_path.stat()
+    replacement = tmp_path / "agent_memory.json.tmp"
+    replacement.write_text('{"emergency_stop": true }')
+    os.utime(replacement, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(replacement, memory_path)
+
+    assert memory_path.stat().st_size == st.st_size
+    assert _read_agent_memory(memory_path) == {"emergency_stop": True}
@@ -16,7 +16,7 @@ from unittest.mock import Mock, MagicMock, patch, AsyncMock
 from pathlib import Path
 import json
 
-from tools import IBKRTools, TOOLS_METADATA
+from tools import IBKRTools, TOOLS_METADATA, INPUT_VALIDATORS
 from connection import ConnectionMode
 
 
@@ -47,21 +47,47 @@ def test_tools_metadata_structure():
         assert "required" in tool["inputSchema"]
 
 
+@pytest.mark.unit
+def test_input_validators(sample_credit_spread_order):
+    """Test precompiled input validators enforce required arguments and types."""
+    assert set(INPUT_VALIDATORS) == {tool["name"] for tool in TOOLS_METADATA}
+
+    validate = INPUT_VALIDATORS["place_order"]
+    validate(sample_credit_spread_order)
+
+    with pytest.raises(ValueError, match="Missing required argument"):
+        validate({"symbol": "AAPL"})
+
+    with pytest.raises(ValueError, match="'max_risk' must be of type number"):
+        validate({**sample_credit_spread_order, "max_risk": "500"})
+
+    with pytest.raises(ValueError, match="'order_id' must be of type integer"):
+        INPUT_VALIDATORS["get_order_status"]({"order_id": True})
+
+    # Explicit nulls: missing when required, a type mismatch when optional
+    with pytest.raises(ValueError, match="Missing required argument.*symbol"):
+        validate({**sample_credit_spread_order, "symbol": None})
+
+    with pytest.raises(ValueError, match="'symbol' must be of type string"):
+        INPUT_VALIDATORS["get_positions"]({"symbol": None})
+
+
 # ==========================================
 # get_account() Tests
 # ==========================================
 
 @pytest.mark.unit
-def test_get_account_success(ibkr_tools, connection_manager, mock_account_values, mock_portfolio_items):
+def test_get_account_success(ibkr_tools, connection_manager, mock_account_values,
+                             mock_account_values_by_tag, mock_portfolio_items):
     """Test get_account returns account information."""
     connection_manager.ib.accountValues.return_value = mock_account_values
     connection_manager.ib.portfolio.return_value = mock_portfolio_items
 
-    with patch('asyncio.run') as mock_run:
-        # Mock asyncio.run to return our mock data
+    with patch('tools.IBKRTools._run') as mock_run:
+        # Mock _run to return our mock data
         def side_effect(coro):
             if 'get_account_values' in str(coro):
-                return {av.tag: av for av in mock_account_values}
+                return mock_account_values_by_tag
             elif 'get_portfolio_items' in str(coro):
                 return mock_portfolio_items
             return None
@@ -93,6 +119,25 @@ def test_get_account_connection_error(ibkr_tools, connection_manager):
             ibkr_tools.get_account()
 
 
+
+@pytest.mark.unit
+def test_get_account_cached_within_ttl(ibkr_tools, mock_account_values_by_tag, mock_portfolio_items):
+    """Test back-to-back get_account calls reuse the cached result until invalidated."""
+    def side_effect(coro):
+        if 'get_account_values' in str(coro):
+            return mock_account_values_by_tag
+        return mock_portfolio_items
+
+    with patch('tools.IBKRTools._run', side_effect=side_effect) as mock_run:
+        first = ibkr_tools.get_account()
+        second = ibkr_tools.get_account()
+        assert mock_run.call_count == 2  # one fetch = account values + portfolio
+        assert second == first
+
+        ibkr_tools._invalidate_account_cache()
+        ibkr_tools.get_account()
+        assert mock_run.call_count == 4
+
 # ==========================================
 # get_positions() Tests
 # ==========================================
@@ -100,7 +145,7 @@ def test_get_account_connection_error(ibkr_tools, connection_manager):
 @pytest.mark.unit
 def test_get_positions_all(ibkr_tools, connection_manager, mock_portfolio_items):
     """Test get_positions returns all positions."""
-    with patch('asyncio.run', return_value=mock_portfolio_items):
+    with patch('tools.IBKRTools._run', return_value=mock_portfolio_items):
         positions = ibkr_tools.get_positions()
 
     assert len(positions) == 2
@@ -114,7 +159,7 @@ def test_get_positions_all(ibkr_tools, connection_manager, mock_portfolio_items)
 @pytest.mark.unit
 def test_get_positions_filtered_by_symbol(ibkr_tools, connection_manager, mock_portfolio_items):
     """Test get_positions with symbol filter."""
-    with patch('asyncio.run', return_value=mock_portfolio_items):
+    with patch('tools.IBKRTools._run', return_value=mock_portfolio_items):
         positions = ibkr_tools.get_positions(symbol="AAPL")
 
     assert len(positions) == 2
@@ -124,7 +169,7 @@ def test_get_positions_filtered_by_symbol(ibkr_tools, connection_manager, mock_p
 @pytest.mark.unit
 def test_get_positions_no_positions(ibkr_tools, connection_manager):
     """Test get_positions when no positions exist."""
-    with patch('asyncio.run', return_value=[]):
+    with patch('tools.IBKRTools._run', return_value=[]):
         positions = ibkr_tools.get_positions()
 
     assert positions == []
@@ -135,25 +180,27 @@ def test_get_positions_no_positions(ibkr_tools, connection_manager):
 # ==========================================
 
 @pytest.mark.unit
-def test_place_order_iron_condor_success(ibkr_tools, sample_iron_condor_order, mock_trade):
+def test_place_order_iron_condor_success(ibkr_tools, mock_ib, sample_iron_condor_order, mock_trade,
+                                         run_coroutines, workspace_home):
     """Test placing Iron Condor order successfully."""
-    # Mock safety validation to pass
+    # Mock safety validation to pass; IB qualifies and accepts every leg
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    mock_ib.qualifyContractsAsync.side_effect = lambda contract: [contract]
+    mock_ib.placeOrder.return_value = mock_trade
 
-    # Mock contract creation and order placement
-    with patch('asyncio.run') as mock_run:
-        mock_run.return_value = mock_trade
-
-        result = ibkr_tools.place_order(
-            symbol=sample_iron_condor_order["symbol"],
-            strategy=sample_iron_condor_order["strategy"],
-            legs=sample_iron_condor_order["legs"],
-            max_risk=sample_iron_condor_order["max_risk"],
-            capital_required=sample_iron_condor_order["capital_required"]
-        )
+    result = ibkr_tools.place_order(
+        symbol=sample_iron_condor_order["symbol"],
+        strategy=sample_iron_condor_order["strategy"],
+        legs=sample_iron_condor_order["legs"],
+        max_risk=sample_iron_condor_order["max_risk"],
+        capital_required=sample_iron_condor_order["capital_required"]
+    )
 
     assert result["success"] is True
     assert len(result["order_ids"]) == 4  # 4 legs
+    assert mock_ib.placeOrder.call_count == 4
+    open_trades = json.loads(workspace_home.read_text())["positions"]["open_trades"]
+    assert [t["trade_id"] for t in open_trades] == [result["trade_id"]]
     assert "trade_id" in result
     assert "IRON_CONDOR" in result["trade_id"]
     assert "AAPL" in result["trade_id"]
@@ -184,7 +231,7 @@ def test_place_order_execution_failure(ibkr_tools, sample_iron_condor_order):
     """Test place_order handles execution failures."""
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
 
-    with patch('asyncio.run', side_effect=Exception("IBKR API error")):
+    with patch('tools.IBKRTools._run', side_effect=Exception("IBKR API error")):
         result = ibkr_tools.place_order(
             symbol=sample_iron_condor_order["symbol"],
             strategy=sample_iron_condor_order["strategy"],
@@ -198,21 +245,24 @@ def test_place_order_execution_failure(ibkr_tools, sample_iron_condor_order):
 
 
 @pytest.mark.unit
-def test_place_order_credit_spread(ibkr_tools, sample_credit_spread_order, mock_trade):
+def test_place_order_credit_spread(ibkr_tools, mock_ib, sample_credit_spread_order, mock_trade,
+                                   run_coroutines, workspace_home):
     """Test placing Credit Spread order."""
     ibkr_tools.safety.validate_order = Mock(return_value=(True, ""))
+    mock_ib.qualifyContractsAsync.side_effect = lambda contract: [contract]
+    mock_ib.placeOrder.return_value = mock_trade
 
-    with patch('asyncio.run', return_value=mock_trade):
-        result = ibkr_tools.place_order(
-            symbol=sample_credit_spread_order["symbol"],
-            strategy=sample_credit_spread_order["strategy"],
-            legs=sample_credit_spread_order["legs"],
-            max_risk=sample_credit_spread_order["max_risk"],
-            capital_required=sample_credit_spread_order["capital_required"]
-        )
+    result = ibkr_tools.place_order(
+        symbol=sample_credit_spread_order["symbol"],
+        strategy=sample_credit_spread_order["strategy"],
+        legs=sample_credit_spread_order["legs"],
+        max_risk=sample_credit_spread_order["max_risk"],
+        capital_required=sample_credit_spread_order["capital_required"]
+    )
 
     assert result["success"] is True
     assert len(result["order_ids"]) == 2  # 2 legs for credit spread
+    assert mock_ib.placeOrder.call_count == 2
 
 
 # ==========================================
@@ -366,7 +416,7 @@ def test_get_order_status(ibkr_tools):
 # ==========================================
 
 @pytest.mark.unit
-def test_health_check_success(ibkr_tools, connection_manager):
+def test_health_check_success(ibkr_tools, connection_manager, run_coroutines):
     """Test health_check returns healthy status."""
     health_data = {
         "is_connected": True,
@@ -374,17 +424,19 @@ def test_health_check_success(ibkr_tools, connection_manager):
         "mode": "Paper Trading (TWS)"
     }
 
-    with patch('asyncio.run', return_value=health_data):
+    with patch.object(connection_manager, 'health_check', AsyncMock(return_value=health_data)) as health:
         result = ibkr_tools.health_check()
 
+    health.assert_awaited_once()
+
     assert result["status"] == "healthy"
     assert result["is_connected"] is True
 
 
 @pytest.mark.unit
-def test_health_check_error(ibkr_tools):
+def test_health_check_error(ibkr_tools, connection_manager, run_coroutines):
     """Test health_check handles errors."""
-    with patch('asyncio.run', side_effect=Exception("Connection error")):
+    with patch.object(connection_manager, 'health_check', AsyncMock(side_effect=Exception("Connection error"))):
         result = ibkr_tools.health_check()
 
     assert result["status"] == "error"
@@ -410,6 +462,6 @@ def test_ensure_connected_reconnects(ibkr_tools, connection_manager):
     """Test _ensure_connected triggers reconnection."""
     connection_manager.is_connected = False
 
-    with patch('asyncio.run'):
+    with patch('tools.IBKRTools._run'):
         ibkr_tools._ensure_connected()
         # Should have called connect
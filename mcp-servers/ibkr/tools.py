@@ -10,22 +10,38 @@ Each tool is exposed to the agent via the MCP protocol and includes:
 
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import json
 from pathlib import Path
 import asyncio
+import operator
+import time
+from types import SimpleNamespace
 
 import os
-from ib_insync import Stock, Option, LimitOrder, Order as IBOrder, Contract
-from safety import SafetyValidator, ViolationType, create_safety_validator
-from connection import get_connection_manager, ConnectionMode
+import orjson
+from ib_insync import Stock, Option, LimitOrder, Order as IBOrder, Contract, util
+from safety import SafetyValidator, ViolationType, create_safety_validator, update_agent_memory
+from connection import IBKRConnectionManager, ConnectionMode
+
+
+# Stand-in for an AccountValue tag IBKR didn't report (reads as 0.0)
+_MISSING_ACCOUNT_VALUE = SimpleNamespace(value="0.0")
 
 
 class IBKRTools:
     """IBKR MCP tool implementations."""
 
-    def __init__(self, connection_mode: ConnectionMode = None):
+    # Account values move on a seconds cadence; back-to-back get_account calls
+    # inside this window (seconds) reuse the previous result
+    ACCOUNT_CACHE_TTL = 0.5
+
+    def __init__(
+        self,
+        connection_mode: ConnectionMode = None,
+        connection_manager: Optional[IBKRConnectionManager] = None
+    ):
         self.safety = create_safety_validator()
-        self.connection_manager = get_connection_manager()
+        # Defaults to the process-wide manager so every IBKRTools shares one connection
+        self.connection_manager = connection_manager or IBKRConnectionManager.instance()
 
         # Auto-detect connection mode from environment
         if connection_mode is None:
@@ -40,6 +56,8 @@ class IBKRTools:
                 connection_mode = ConnectionMode.PAPER_TWS
 
         self.connection_mode = connection_mode
+        self._account_cache: Optional[Dict[str, Any]] = None
+        self._account_cache_ts = 0.0
         # Don't connect immediately - connect on first tool call
         # self._ensure_connected()
 
@@ -57,16 +75,48 @@ class IBKRTools:
         except Exception as e:
             raise ConnectionError(f"Failed to connect to IBKR: {e}")
 
+    def _run(self, coro):
+        """
+        Run a coroutine to completion for the synchronous tool methods.
+
+        Uses ib_insync's event loop for this thread, which persists across
+        calls (and is the loop the IB socket is attached to), instead of
+        creating and tearing down a new loop per call like asyncio.run.
+
+        Raises:
+            RuntimeError: If called while an event loop is already running
+                (use the *_async methods from async code)
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return util.run(coro)
+        coro.close()
+        raise RuntimeError(
+            "Synchronous IBKRTools methods cannot be called from async context - "
+            "use the *_async methods instead"
+        )
+
     def get_account(self) -> Dict[str, Any]:
         """
         Get account information including balance, buying power, and positions.
 
-        DEPRECATED: Use get_account_async() instead for proper async support.
+        Synchronous wrapper for callers without an event loop; async code
+        (e.g. the MCP server) must use get_account_async().
 
         Returns:
-            Dictionary with account details
+            Dictionary with account details (see get_account_async)
         """
-        raise RuntimeError("Use get_account_async() instead - this method cannot be called from async context")
+        cached = self._cached_account()
+        if cached is not None:
+            return cached
+
+        self._ensure_connected()
+
+        account_values = self._run(self.connection_manager.get_account_values_async())
+        portfolio_items = self._run(self.connection_manager.get_portfolio_items_async())
+
+        return self._store_account(self._format_account(account_values, portfolio_items))
 
     async def get_account_async(self) -> Dict[str, Any]:
         """
@@ -84,20 +134,45 @@ class IBKRTools:
                 "realized_pnl": float
             }
         """
+        cached = self._cached_account()
+        if cached is not None:
+            return cached
+
         self._ensure_connected()
 
-        # Get account values from IBKR (async call)
+        # Get account values and portfolio items from IBKR (async calls)
         account_values = await self.connection_manager.get_account_values_async()
+        portfolio_items = await self.connection_manager.get_portfolio_items_async()
+
+        return self._store_account(self._format_account(account_values, portfolio_items))
 
+    def _cached_account(self) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached get_account result if still within ACCOUNT_CACHE_TTL."""
+        if self._account_cache is not None and \
+                time.monotonic() - self._account_cache_ts < self.ACCOUNT_CACHE_TTL:
+            return dict(self._account_cache)
+        return None
+
+    def _store_account(self, account: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache a fresh get_account result and return it."""
+        self._account_cache = dict(account)
+        self._account_cache_ts = time.monotonic()
+        return account
+
+    def _invalidate_account_cache(self):
+        """Drop the cached account snapshot (orders and closes change it)."""
+        self._account_cache = None
+
+    def _format_account(self, account_values: Dict, portfolio_items: List) -> Dict[str, Any]:
+        """Build the get_account result from IBKR account values and portfolio items."""
         # Extract key values
-        net_liquidation = float(account_values.get("NetLiquidation", type("", (), {"value": "0.0"})).value)
-        cash_balance = float(account_values.get("TotalCashValue", type("", (), {"value": "0.0"})).value)
-        buying_power = float(account_values.get("BuyingPower", type("", (), {"value": "0.0"})).value)
-        unrealized_pnl = float(account_values.get("UnrealizedPnL", type("", (), {"value": "0.0"})).value)
-        realized_pnl = float(account_values.get("RealizedPnL", type("", (), {"value": "0.0"})).value)
+        net_liquidation = float(account_values.get("NetLiquidation", _MISSING_ACCOUNT_VALUE).value)
+        cash_balance = float(account_values.get("TotalCashValue", _MISSING_ACCOUNT_VALUE).value)
+        buying_power = float(account_values.get("BuyingPower", _MISSING_ACCOUNT_VALUE).value)
+        unrealized_pnl = float(account_values.get("UnrealizedPnL", _MISSING_ACCOUNT_VALUE).value)
+        realized_pnl = float(account_values.get("RealizedPnL", _MISSING_ACCOUNT_VALUE).value)
 
-        # Get portfolio items to calculate total positions value (async call)
-        portfolio_items = await self.connection_manager.get_portfolio_items_async()
+        # Total positions value from portfolio items
         total_positions_value = sum(item.marketValue for item in portfolio_items)
 
         # Get account ID
@@ -118,15 +193,20 @@ class IBKRTools:
         """
         Get current open positions.
 
-        DEPRECATED: Use get_positions_async() instead for proper async support.
+        Synchronous wrapper for callers without an event loop; async code
+        must use get_positions_async().
 
         Args:
             symbol: Optional symbol filter
 
         Returns:
-            List of position dictionaries
+            List of position dictionaries (see get_positions_async)
         """
-        raise RuntimeError("Use get_positions_async() instead - this method cannot be called from async context")
+        self._ensure_connected()
+
+        portfolio_items = self._run(self.connection_manager.get_portfolio_items_async())
+
+        return self._format_positions(portfolio_items, symbol)
 
     async def get_positions_async(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -152,34 +232,48 @@ class IBKRTools:
         # Get portfolio items from IBKR (async call)
         portfolio_items = await self.connection_manager.get_portfolio_items_async()
 
+        return self._format_positions(portfolio_items, symbol)
+
+    # PortfolioItem fields read for each position, fetched in one C-level call
+    _POSITION_FIELDS = operator.attrgetter(
+        "contract", "position", "averageCost", "marketPrice",
+        "marketValue", "unrealizedPNL", "realizedPNL"
+    )
+
+    def _format_positions(self, portfolio_items: List, symbol: Optional[str]) -> List[Dict[str, Any]]:
+        """Build the get_positions result from IBKR portfolio items."""
+        fields = self._POSITION_FIELDS
         positions = []
 
+        # Filter by symbol first, so skipped items aren't unpacked
+        if symbol:
+            portfolio_items = [item for item in portfolio_items if item.contract.symbol == symbol]
+
         for item in portfolio_items:
-            # Get contract symbol
-            contract_symbol = item.contract.symbol
+            contract, quantity, avg_cost, market_price, market_value, unrealized_pnl, realized_pnl = fields(item)
+            contract_symbol = contract.symbol
 
-            # Filter by symbol if provided
-            if symbol and contract_symbol != symbol:
-                continue
+            sec_type = contract.secType  # STK, OPT, FUT, etc.
+            unrealized_pnl = float(unrealized_pnl)
 
             # Build position dictionary
             position = {
                 "symbol": contract_symbol,
-                "contract_type": item.contract.secType,  # STK, OPT, FUT, etc.
-                "quantity": int(item.position),
-                "avg_cost": float(item.averageCost),
-                "current_price": float(item.marketPrice) if item.marketPrice else 0.0,
-                "market_value": float(item.marketValue),
-                "unrealized_pnl": float(item.unrealizedPNL),
-                "unrealized_pnl_percent": (float(item.unrealizedPNL) / float(item.averageCost * abs(item.position)) * 100) if item.averageCost and item.position else 0.0,
-                "realized_pnl": float(item.realizedPNL)
+                "contract_type": sec_type,
+                "quantity": int(quantity),
+                "avg_cost": float(avg_cost),
+                "current_price": float(market_price) if market_price else 0.0,
+                "market_value": float(market_value),
+                "unrealized_pnl": unrealized_pnl,
+                "unrealized_pnl_percent": (unrealized_pnl / float(avg_cost * abs(quantity)) * 100) if avg_cost and quantity else 0.0,
+                "realized_pnl": float(realized_pnl)
             }
 
             # Add options-specific fields
-            if item.contract.secType == "OPT":
-                position["strike"] = float(item.contract.strike) if hasattr(item.contract, "strike") else None
-                position["right"] = item.contract.right if hasattr(item.contract, "right") else None
-                position["expiry"] = item.contract.lastTradeDateOrContractMonth if hasattr(item.contract, "lastTradeDateOrContractMonth") else None
+            if sec_type == "OPT":
+                position["strike"] = float(contract.strike) if hasattr(contract, "strike") else None
+                position["right"] = contract.right if hasattr(contract, "right") else None
+                position["expiry"] = contract.lastTradeDateOrContractMonth if hasattr(contract, "lastTradeDateOrContractMonth") else None
 
             positions.append(position)
 
@@ -256,13 +350,12 @@ class IBKRTools:
         trade_id = f"{strategy.upper().replace(' ', '_')}_{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         # Submit multi-leg order to IBKR
+        self._invalidate_account_cache()
+        trades = []
         try:
             self._ensure_connected()
 
-            # Place all legs of the order
-            trades = []
-            order_ids = []
-
+            # Place all legs of the order, one at a time
             for leg in legs:
                 # Create IBKR contract
                 contract = self._create_contract_from_leg(leg)
@@ -270,11 +363,11 @@ class IBKRTools:
                 # Create IBKR order
                 ib_order = self._create_order_from_leg(leg)
 
-                # Submit order - this shouldn't be called from sync context
-                # For now, return error
-                raise RuntimeError("Use place_order_async for actual order placement")
-                # trades.append(trade)
-                # order_ids.append(trade.order.orderId)
+                # Submit order
+                trade = self._run(self.connection_manager.place_order(contract, ib_order))
+                trades.append(trade)
+
+            order_ids = [trade.order.orderId for trade in trades]
 
             # Log trade execution
             self._log_trade_execution(trade_id, order, order_ids, metadata)
@@ -283,17 +376,16 @@ class IBKRTools:
             self._update_agent_memory_position(trade_id, order)
 
         except Exception as e:
-            # Order execution failed
-            error_msg = f"Failed to execute order: {e}"
-            self.safety.log_violation(ViolationType.INVALID_ORDER, error_msg)
+            # Don't leave legs live at IBKR that agent memory doesn't know about
+            cancelled, uncancelled = [], []
+            for trade in trades:
+                try:
+                    self._run(self.connection_manager.cancel_order(trade.order))
+                    cancelled.append(trade.order.orderId)
+                except Exception:
+                    uncancelled.append(trade.order.orderId)
 
-            return {
-                "success": False,
-                "order_ids": [],
-                "trade_id": None,
-                "message": error_msg,
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._failed_order_result(e, trades, cancelled, uncancelled)
 
         return {
             "success": True,
@@ -356,24 +448,39 @@ class IBKRTools:
         trade_id = f"{strategy.upper().replace(' ', '_')}_{symbol}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         # Submit multi-leg order to IBKR
+        self._invalidate_account_cache()
+        trades = []
         try:
             self._ensure_connected()
 
-            # Place all legs of the order
-            trades = []
-            order_ids = []
-
-            for leg in legs:
-                # Create IBKR contract
-                contract = self._create_contract_from_leg(leg)
-
-                # Create IBKR order
-                ib_order = self._create_order_from_leg(leg)
-
-                # Submit order using async method
-                trade = await self.connection_manager.place_order(contract, ib_order)
-                trades.append(trade)
-                order_ids.append(trade.order.orderId)
+            leg_orders = [
+                (self._create_contract_from_leg(leg), self._create_order_from_leg(leg))
+                for leg in legs
+            ]
+
+            # Qualify every leg concurrently so those round-trips overlap (and
+            # a bad contract fails the order before anything is submitted);
+            # place_order then reuses the manager's qualified contracts
+            qualify_tasks = [
+                asyncio.ensure_future(self.connection_manager.qualify_contract(contract))
+                for contract, _ in leg_orders
+            ]
+            try:
+                await asyncio.gather(*qualify_tasks)
+            except BaseException:
+                # Cancel the other legs' requests and wait for them to finish,
+                # so none is left running on the IB connection
+                for task in qualify_tasks:
+                    task.cancel()
+                await asyncio.gather(*qualify_tasks, return_exceptions=True)
+                raise
+
+            # Submit legs one at a time, so a failure leaves a known set of
+            # placed legs to cancel
+            for contract, ib_order in leg_orders:
+                trades.append(await self.connection_manager.place_order(contract, ib_order))
+
+            order_ids = [trade.order.orderId for trade in trades]
 
             # Log trade execution
             self._log_trade_execution(trade_id, order, order_ids, metadata)
@@ -382,17 +489,16 @@ class IBKRTools:
             self._update_agent_memory_position(trade_id, order)
 
         except Exception as e:
-            # Order execution failed
-            error_msg = f"Failed to execute order: {e}"
-            self.safety.log_violation(ViolationType.INVALID_ORDER, error_msg)
+            # Don't leave legs live at IBKR that agent memory doesn't know about
+            cancelled, uncancelled = [], []
+            for trade in trades:
+                try:
+                    await self.connection_manager.cancel_order(trade.order)
+                    cancelled.append(trade.order.orderId)
+                except Exception:
+                    uncancelled.append(trade.order.orderId)
 
-            return {
-                "success": False,
-                "order_ids": [],
-                "trade_id": None,
-                "message": error_msg,
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._failed_order_result(e, trades, cancelled, uncancelled)
 
         return {
             "success": True,
@@ -402,6 +508,36 @@ class IBKRTools:
             "timestamp": datetime.now().isoformat()
         }
 
+    def _failed_order_result(
+        self,
+        error: Exception,
+        trades: List,
+        cancelled: List[int],
+        uncancelled: List[int]
+    ) -> Dict[str, Any]:
+        """
+        Log and report an order that failed during submission or bookkeeping.
+
+        Legs IBKR had already accepted are reported by order ID together with
+        the outcome of cancelling them, so nothing placed goes unrecorded.
+        """
+        placed = [trade.order.orderId for trade in trades]
+        error_msg = f"Failed to execute order: {error}"
+        if placed:
+            error_msg += f". Legs already placed: {placed}, cancelled: {cancelled}"
+            if uncancelled:
+                error_msg += f". CANCEL FAILED, still live at IBKR: {uncancelled}"
+        self.safety.log_violation(ViolationType.INVALID_ORDER, error_msg)
+
+        return {
+            "success": False,
+            "order_ids": placed,
+            "cancelled_order_ids": cancelled,
+            "trade_id": None,
+            "message": error_msg,
+            "timestamp": datetime.now().isoformat()
+        }
+
     def close_position(self, trade_id: str) -> Dict[str, Any]:
         """
         Close an existing position by trade ID.
@@ -419,10 +555,30 @@ class IBKRTools:
                 "message": str
             }
         """
-        # Load position from agent memory
         memory_path = Path.home() / "trading_workspace" / "state" / "agent_memory.json"
 
-        if not memory_path.exists():
+        def remove_position(memory: Dict) -> Optional[Dict]:
+            # Find the position
+            positions = memory.get("positions", {}).get("open_trades", [])
+            position = next((p for p in positions if p.get("trade_id") == trade_id), None)
+            if not position:
+                return None
+
+            # Remove from open positions
+            positions.remove(position)
+            memory["positions"]["open_trades"] = positions
+            memory["positions"]["closed_trades_count"] += 1
+
+            # Update performance metrics (realized P&L is a placeholder for now)
+            if position.get("unrealized_pnl", 0.0) > 0:
+                memory["performance_metrics"]["profitable_trades"] += 1
+            memory["performance_metrics"]["total_trades"] += 1
+            return position
+
+        # Remove the position from agent memory
+        try:
+            position = update_agent_memory(remove_position, memory_path)
+        except FileNotFoundError:
             return {
                 "success": False,
                 "trade_id": trade_id,
@@ -431,13 +587,6 @@ class IBKRTools:
                 "message": f"Trade ID {trade_id} not found in agent memory"
             }
 
-        with open(memory_path, 'r') as f:
-            memory = json.load(f)
-
-        # Find the position
-        positions = memory.get("positions", {}).get("open_trades", [])
-        position = next((p for p in positions if p.get("trade_id") == trade_id), None)
-
         if not position:
             return {
                 "success": False,
@@ -453,20 +602,7 @@ class IBKRTools:
 
         # Calculate realized P&L (placeholder)
         realized_pnl = position.get("unrealized_pnl", 0.0)  # Placeholder
-
-        # Remove from open positions
-        positions.remove(position)
-        memory["positions"]["open_trades"] = positions
-        memory["positions"]["closed_trades_count"] += 1
-
-        # Update performance metrics
-        if realized_pnl > 0:
-            memory["performance_metrics"]["profitable_trades"] += 1
-        memory["performance_metrics"]["total_trades"] += 1
-
-        # Save updated memory
-        with open(memory_path, 'w') as f:
-            json.dump(memory, f, indent=2)
+        self._invalidate_account_cache()
 
         # Log close
         self._log_trade_close(trade_id, close_order_ids, realized_pnl)
@@ -500,14 +636,13 @@ class IBKRTools:
 
     def health_check(self) -> Dict[str, Any]:
         """
-        Perform health check on IBKR connection (legacy sync wrapper).
+        Perform health check on IBKR connection (sync wrapper).
 
         Returns:
             Health status dictionary with connection info and status
         """
         try:
-            # Use synchronous health check
-            return self.health_check_sync()
+            return self._run(self.connection_manager.health_check())
         except Exception as e:
             return {
                 "status": "error",
@@ -515,35 +650,6 @@ class IBKRTools:
                 "is_connected": False
             }
 
-    def health_check_sync(self) -> Dict[str, Any]:
-        """
-        Perform synchronous health check on IBKR connection.
-
-        Returns:
-            Health status dictionary with connection info and status
-        """
-        health = {
-            "is_connected": self.connection_manager.ib.isConnected() if self.connection_manager.ib else False,
-            "mode": self.connection_manager.mode.description if self.connection_manager.mode else None,
-            "last_connection_time": self.connection_manager.last_connection_time.isoformat() if self.connection_manager.last_connection_time else None,
-            "reconnect_attempts": self.connection_manager.reconnect_attempts,
-            "client_id": self.connection_manager.client_id
-        }
-
-        # Try to get account values as a deeper health check
-        if health["is_connected"]:
-            try:
-                account_values = self.connection_manager.ib.accountValues()
-                health["account_values_count"] = len(account_values)
-                health["status"] = "healthy"
-            except Exception as e:
-                health["status"] = "unhealthy"
-                health["error"] = str(e)
-        else:
-            health["status"] = "disconnected"
-
-        return health
-
     async def health_check_async(self) -> Dict[str, Any]:
         """
         Perform async health check on IBKR connection.
@@ -651,8 +757,8 @@ class IBKRTools:
             "metadata": metadata or {}
         }
 
-        with open(log_path, 'w') as f:
-            json.dump(log_entry, f, indent=2)
+        with open(log_path, 'wb') as f:
+            f.write(orjson.dumps(log_entry, option=orjson.OPT_INDENT_2))
 
     def _log_trade_close(self, trade_id: str, close_order_ids: List[int], realized_pnl: float):
         """Log trade close details."""
@@ -666,16 +772,13 @@ class IBKRTools:
             "realized_pnl": realized_pnl
         }
 
-        with open(log_path, 'w') as f:
-            json.dump(log_entry, f, indent=2)
+        with open(log_path, 'wb') as f:
+            f.write(orjson.dumps(log_entry, option=orjson.OPT_INDENT_2))
 
     def _update_agent_memory_position(self, trade_id: str, order: Dict):
         """Add new position to agent memory."""
         memory_path = Path.home() / "trading_workspace" / "state" / "agent_memory.json"
 
-        with open(memory_path, 'r') as f:
-            memory = json.load(f)
-
         position = {
             "trade_id": trade_id,
             "symbol": order["symbol"],
@@ -687,10 +790,11 @@ class IBKRTools:
             "unrealized_pnl": 0.0  # Will be updated by market data
         }
 
-        memory["positions"]["open_trades"].append(position)
+        def add_position(memory: Dict) -> Dict:
+            memory["positions"]["open_trades"].append(position)
+            return position
 
-        with open(memory_path, 'w') as f:
-            json.dump(memory, f, indent=2)
+        update_agent_memory(add_position, memory_path)
 
 
 # Tool metadata for MCP protocol
@@ -790,3 +894,73 @@ TOOLS_METADATA = [
         }
     }
 ]
+
+
+# JSON Schema primitive types used by the tool input schemas above
+_JSON_TYPES = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+
+def _compile_input_validator(schema: Dict[str, Any]):
+    """
+    Compile a tool inputSchema into a validator function.
+
+    Supports the subset the tool schemas use (object with required keys and
+    primitive property types, optionally a list including "null"). Everything
+    is resolved here, once, so each call only checks presence and isinstance.
+    """
+    property_types = {}
+    for prop, spec in schema.get("properties", {}).items():
+        type_names = spec.get("type")
+        if isinstance(type_names, str):
+            type_names = [type_names]
+        type_names = [name for name in type_names or () if name in _JSON_TYPES or name == "null"]
+        if not type_names:
+            continue
+        types = tuple(t for name in type_names for t in _JSON_TYPES.get(name, ()))
+        property_types[prop] = (types, " or ".join(type_names), "null" in type_names)
+
+    # A required key explicitly set to None counts as missing unless its type allows null
+    required = tuple(
+        (key, key in property_types and property_types[key][2])
+        for key in schema.get("required", ())
+    )
+    property_types = tuple((prop, *spec) for prop, spec in property_types.items())
+
+    def validate(arguments: Dict[str, Any]) -> None:
+        """Raise ValueError if arguments don't match the tool's inputSchema."""
+        missing = [
+            key for key, nullable in required
+            if key not in arguments or (arguments[key] is None and not nullable)
+        ]
+        if missing:
+            raise ValueError(f"Missing required argument(s): {', '.join(missing)}")
+
+        for prop, types, type_name, nullable in property_types:
+            if prop not in arguments:
+                continue
+            value = arguments[prop]
+            if value is None:
+                if nullable:
+                    continue
+            # bool is an int subclass, but JSON booleans aren't numbers
+            elif isinstance(value, types) and not (
+                isinstance(value, bool) and bool not in types
+            ):
+                continue
+            raise ValueError(f"Argument '{prop}' must be of type {type_name}")
+
+    return validate
+
+
+# Compiled once at import; the server validates tools/call arguments with these
+INPUT_VALIDATORS = {
+    tool["name"]: _compile_input_validator(tool["inputSchema"])
+    for tool in TOOLS_METADATA
+}
@@ -72,9 +72,9 @@ def get_account_value() -> float:
         # Add parent directory to path to import from mcp-servers
         sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'mcp-servers', 'ibkr'))
 
-        from connection import get_connection_manager, ConnectionMode
+        from connection import IBKRConnectionManager, ConnectionMode
 
-        manager = get_connection_manager()
+        manager = IBKRConnectionManager.instance()
 
         # Connect with separate client ID if not already connected
         if not manager.is_connected:
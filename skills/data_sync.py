@@ -11,7 +11,7 @@ import pytz
 import httpx
 
 from data_lake.market_data_manager import insert_bars, get_latest_bar, OHLCVBar
-from data_lake.db_helpers import get_db_connection
+from data_lake.db_config import get_db_connection
 from skills.market_calendar import get_market_session_info
 
 logger = logging.getLogger(__name__)